@@ -0,0 +1,66 @@
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from harmtex.compiler import ScoreTree, DEFINITION_BLOCKS
+from harmtex.xmlbackend import get_backend
+
+SOURCE = Path(__file__).parent.parent / 'xml' / 'nocturne-chopin.xml'
+MARK = '@COPY@'
+
+
+def write_score(path: Path, size: int):
+    # Copies of the definitions of the nocturne with suffixed ids, and an ast concatenating the copies of its ast,
+    # until the file reaches the size; written as text, copy by copy
+    root = ET.parse(SOURCE).getroot()
+    for e in root.iter():
+        if e.attrib.get('id') is not None:
+            e.attrib['id'] += MARK
+        if e.tag == 'id':
+            e.text += MARK
+    ast = root.find('ast')
+    body = ET.tostring(ast[0], encoding='unicode')
+    blocks = {block.tag: ''.join(ET.tostring(d, encoding='unicode') for d in block)
+              for block in root if block.tag in DEFINITION_BLOCKS}
+    header = ''.join(ET.tostring(e, encoding='unicode') for e in root
+                     if e.tag not in DEFINITION_BLOCKS and e.tag != 'ast')
+    copies = max(1, size // (sum(map(len, blocks.values())) + len(body)))
+
+    with open(path, 'w') as file:
+        file.write('<score>' + header)
+        for tag, definitions in blocks.items():
+            file.write(f'<{tag}>')
+            for k in range(copies):
+                file.write(definitions.replace(MARK, f'-{k}'))
+            file.write(f'</{tag}>')
+        file.write('<ast><concatenate>')
+        for k in range(copies):
+            file.write(body.replace(MARK, f'-{k}'))
+        file.write('</concatenate></ast></score>')
+
+
+backends = []
+for name in ['etree', 'lxml']:
+    try:
+        backends.append(get_backend(name))
+    except ImportError:
+        print(f"{name} is not installed")
+
+# Largest size in MB as first argument
+largest = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+sizes = [size for size in [10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8] if size <= largest * 10 ** 6]
+
+with tempfile.TemporaryDirectory() as directory:
+    print(f"{'size (MB)':>10} {'backend':>8} {'parse (s)':>10} {'decode (s)':>11} {'MB/s':>8}")
+    for size in sizes:
+        path = Path(directory) / f'score-{size}.xml'
+        write_score(path, size)
+        megabytes = path.stat().st_size / 10 ** 6
+        for backend in backends:
+            start = time.perf_counter()
+            tree = ScoreTree(path, backend=backend)
+            elapsed = time.perf_counter() - start
+            print(f"{megabytes:>10.2f} {backend.name:>8} {tree.timings['parse']:>10.3f} "
+                  f"{tree.timings['decode']:>11.3f} {megabytes / elapsed:>8.2f}")
+            del tree
@@ -0,0 +1,24 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from harmtex.batch import find_scores, compile_scores
+
+SOURCES = [Path(__file__).parent.parent / 'xml' / name for name in ['nocturne-chopin.xml', 'symphony-mozart.xml']]
+
+
+with tempfile.TemporaryDirectory() as directory:
+    scores = Path(directory) / 'scores'
+    scores.mkdir()
+    for k in range(32):
+        for source in SOURCES:
+            (scores / f'{source.stem}-{k}.xml').write_bytes(source.read_bytes())
+    jobs = find_scores([scores], Path(directory) / 'midi')
+
+    print(f"{'workers':>8} {'scores':>8} {'time (s)':>10} {'scores/s':>10}")
+    for workers in sorted({1, 2, 4, os.cpu_count()}):
+        start = time.perf_counter()
+        results = list(compile_scores(jobs, workers))
+        elapsed = time.perf_counter() - start
+        assert all(result.error is None for result in results)
+        print(f"{workers:>8} {len(jobs):>8} {elapsed:>10.3f} {len(jobs) / elapsed:>10.1f}")
@@ -0,0 +1,30 @@
+import time
+from harmtex.functions import concatenation
+from harmtex.model import Hit, Harmony, Chord, Rhythm, Texture, Instrumentation, Instrument, Section
+
+# Block
+t_block = Texture(
+    Rhythm(Hit('0', '1/8'), Hit('1/4', '1/8')),
+    Rhythm(Hit('1/8', '1/8')),
+    Rhythm(Hit('3/8', '1/8'))
+)
+h_block = Harmony(Chord({48}), Chord({55, 64}), Chord({60}))
+piano = Section(Instrument('Acoustic Grand Piano'))
+o_block = Instrumentation(piano, piano, piano)
+
+block = t_block * h_block * o_block
+
+# Scaling
+print(f"{'blocks':>8} {'time (s)':>10} {'per block (us)':>15} {'endpoint (us)':>14}")
+for n in [1000, 2000, 5000, 10000]:
+    blocks = [block for _ in range(n)]
+    start = time.perf_counter()
+    piece = concatenation(*blocks)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    endpoint = piece.texture.endpoint
+    elapsed_endpoint = time.perf_counter() - start
+
+    assert endpoint == n * t_block.endpoint
+    print(f"{n:>8} {elapsed:>10.3f} {elapsed / n * 1e6:>15.1f} {elapsed_endpoint * 1e6:>14.1f}")
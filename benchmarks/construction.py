@@ -0,0 +1,44 @@
+import time
+from harmtex.model import frac, Hit, Rhythm, Texture, Pitch, Chord, Harmony, Instrument, Section, Instrumentation
+
+
+def throughput(construct, n=20000):
+    start = time.perf_counter()
+    for _ in range(n):
+        construct()
+    return n / (time.perf_counter() - start)
+
+
+def dispatched(cls, *args):
+    # Calls the multimethod __init__ directly, as before the dispatch cache
+    def construct():
+        obj = object.__new__(cls)
+        cls.__init__.__wrapped__(obj, *args)
+        return obj
+    return construct
+
+
+onset, duration = frac(1, 4), frac(1, 8)
+hits = {Hit(frac(i, 8), frac(1, 8)) for i in range(16)}
+rhythms = [Rhythm._make(hits) for _ in range(16)]
+pitches = {Pitch(p) for p in [48, 55, 60, 64, 67]}
+chords = [Chord._make(pitches) for _ in range(16)]
+sections = [Section._make({Instrument('Acoustic Grand Piano')}) for _ in range(16)]
+
+cases = [
+    ('Hit', Hit, (onset, duration), lambda: Hit._make(onset, duration)),
+    ('Rhythm', Rhythm, (hits,), lambda: Rhythm._make(hits)),
+    ('Texture', Texture, (rhythms,), lambda: Texture._make(rhythms)),
+    ('Pitch', Pitch, (60,), lambda: Pitch._make(60)),
+    ('Chord', Chord, (pitches,), lambda: Chord._make(pitches)),
+    ('Harmony', Harmony, (chords,), lambda: Harmony._make(chords)),
+    ('Section', Section, (sections[0].instruments,), lambda: Section._make(sections[0].instruments)),
+    ('Instrumentation', Instrumentation, (sections,), lambda: Instrumentation._make(sections)),
+]
+
+print(f"{'constructions/s':<16} {'multimethod':>12} {'cached':>12} {'_make':>12}")
+for name, cls, args, make in cases:
+    before = throughput(dispatched(cls, *args))
+    cached = throughput(lambda: cls(*args))
+    fast = throughput(make)
+    print(f"{name:<16} {before:>12.0f} {cached:>12.0f} {fast:>12.0f}")
@@ -0,0 +1,99 @@
+import copy
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from harmtex.compiler import ScoreTree, DEFINITION_BLOCKS
+
+SOURCE = Path(__file__).parent.parent / 'xml' / 'nocturne-chopin.xml'
+
+
+def enlarged(copies: int) -> ET.ElementTree:
+    # Copies of every definition with suffixed ids, and an ast concatenating the copies of the original ast
+    root = ET.parse(SOURCE).getroot()
+    ast = root.find('ast')
+    body = ast[0]
+    ast.remove(body)
+    concatenate = ET.SubElement(ast, 'concatenate')
+
+    blocks = [block for block in root if block.tag in DEFINITION_BLOCKS]
+    originals = [list(block) for block in blocks]
+    for k in range(copies):
+        for block, definitions in zip(blocks, originals):
+            for definition in definitions:
+                block.append(suffixed(definition, k))
+        concatenate.append(suffixed(body, k))
+    for block, definitions in zip(blocks, originals):
+        for definition in definitions:
+            block.remove(definition)
+    return ET.ElementTree(root)
+
+
+def suffixed(element: ET.Element, k: int) -> ET.Element:
+    element = copy.deepcopy(element)
+    for e in element.iter():
+        if e.attrib.get('id') is not None:
+            e.attrib['id'] += f'-{k}'
+        if e.tag == 'id':
+            e.text += f'-{k}'
+    return element
+
+
+def nested(depth: int) -> str:
+    # A chain of concatenations, each one holding the next, written as text since ElementTree serializes
+    # recursively
+    root = ET.parse(SOURCE).getroot()
+    ast = root.find('ast')
+    body = ET.tostring(ast[0], encoding='unicode')
+    ast.remove(ast[0])
+    ast.text = 'AST'
+    chain = '<concatenate>' * depth + body + '</concatenate>' * depth
+    return ET.tostring(root, encoding='unicode').replace('AST', chain)
+
+
+with tempfile.TemporaryDirectory() as directory:
+    print(f"{'copies':>8} {'elements':>10} {'tree (s)':>10} {'streaming (s)':>14} {'elements/s':>12}")
+    for copies in [1, 10, 50, 100]:
+        path = Path(directory) / f'enlarged-{copies}.xml'
+        tree = enlarged(copies)
+        tree.write(path)
+        elements = sum(1 for _ in tree.getroot().iter())
+
+        start = time.perf_counter()
+        ScoreTree(path)
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ScoreTree(path, streaming=True)
+        elapsed_streaming = time.perf_counter() - start
+        print(f"{copies:>8} {elements:>10} {elapsed:>10.3f} {elapsed_streaming:>14.3f} {elements / elapsed:>12.0f}")
+
+    print()
+    print(f"{'copies':>8} {'compile (s)':>12} {'update (s)':>11} {'decoded':>8}")
+    for copies in [10, 100]:
+        path = Path(directory) / f'enlarged-{copies}.xml'
+        tree = ScoreTree(path)
+
+        # One note changed in the last copy
+        edited = Path(directory) / f'edited-{copies}.xml'
+        text = path.read_text()
+        index = text.rindex('<number>55</number>')
+        edited.write_text(text[:index] + '<number>56</number>' + text[index + len('<number>55</number>'):])
+
+        start = time.perf_counter()
+        ScoreTree(edited)
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoded = tree.update(edited)
+        print(f"{copies:>8} {elapsed:>12.3f} {time.perf_counter() - start:>11.3f} {len(decoded):>8}")
+
+    print()
+    print(f"{'depth':>8} {'time (s)':>10}")
+    for depth in [100, 1000, 5000]:
+        path = Path(directory) / f'nested-{depth}.xml'
+        path.write_text(nested(depth))
+
+        start = time.perf_counter()
+        ScoreTree(path)
+        print(f"{depth:>8} {time.perf_counter() - start:>10.3f}")
@@ -0,0 +1,33 @@
+import tracemalloc
+from harmtex.model import Hit, Harmony, Chord, Rhythm, Texture, Instrumentation, Instrument, Section
+
+# Block
+t_block = Texture(
+    Rhythm(Hit('0', '1/8'), Hit('1/4', '1/8')),
+    Rhythm(Hit('1/8', '1/8'), Hit('3/8', '1/8')),
+    Rhythm(Hit('0', '1/2'))
+)
+h_block = Harmony(Chord({48}), Chord({55, 64}), Chord({36, 43}))
+o_block = Instrumentation(Section(Instrument('Acoustic Grand Piano')),
+                          Section(Instrument('Acoustic Grand Piano'), Instrument('Violin')),
+                          Section(Instrument('Contrabass')))
+
+block = t_block * h_block * o_block
+
+
+def allocated(build):
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+# Memory held by the notes of the score, once computed
+print(f"{'notes':>8} {'set (B/note)':>13} {'array (B/note)':>15}")
+for n in [100, 1000, 10000]:
+    piece = block * n
+    notes, set_size = allocated(piece.notes)
+    array, array_size = allocated(piece.to_note_array)
+    assert len(notes) == len(array)
+    print(f"{len(notes):>8} {set_size / len(notes):>13.1f} {array_size / len(array):>15.1f}")
@@ -0,0 +1,44 @@
+import random
+import time
+from harmtex.constants import ROMAN_NUMERAL_TO_FACTORS
+from harmtex.model import Chord, Harmony
+
+random.seed(0)
+numerals = list(ROMAN_NUMERAL_TO_FACTORS)
+factors = [['1', '3', '5'], ['1', '-', '5', '3'], ['5', '1', '3', '5']]
+
+print(f"{'chords':>8} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>8}")
+for n in [1000, 10000, 100000]:
+    progression = [random.choice(numerals) for _ in range(n)]
+    inversions = [random.randint(0, 2) for _ in range(n)]
+    octaves = [random.randint(3, 5) for _ in range(n)]
+
+    start = time.perf_counter()
+    looped = Harmony._make([Chord.from_roman_numeral(numeral, inversion, octave)
+                            for numeral, inversion, octave in zip(progression, inversions, octaves)])
+    elapsed_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = Harmony.from_roman_numerals(progression, inversions, octaves)
+    elapsed_batch = time.perf_counter() - start
+
+    assert len(batched) == len(looped) == n
+    print(f"{n:>8} {elapsed_loop:>10.3f} {elapsed_batch:>10.3f} {elapsed_loop / elapsed_batch:>8.1f}")
+
+print()
+print(f"{'numerals':>8} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>8}")
+for n in [1000, 10000, 100000]:
+    progression = [random.choice(numerals) for _ in range(n)]
+    progression_factors = [random.choice(factors) for _ in range(n)]
+
+    start = time.perf_counter()
+    looped = Harmony._make([chord for numeral, numeral_factors in zip(progression, progression_factors)
+                            for chord in Harmony.from_roman_numeral(numeral, numeral_factors, 4).chords])
+    elapsed_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = Harmony.from_roman_numeral_factors(progression, progression_factors, 4)
+    elapsed_batch = time.perf_counter() - start
+
+    assert len(batched) == len(looped)
+    print(f"{n:>8} {elapsed_loop:>10.3f} {elapsed_batch:>10.3f} {elapsed_loop / elapsed_batch:>8.1f}")
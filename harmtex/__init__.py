@@ -1,4 +1,7 @@
+__version__ = '0.1.0'
+
 from .model import frac, Pitch, Hit, Chord, Rhythm, Harmony, Texture, Instrument, Section, Instrumentation, \
     TensorContraction
+from .array import NoteArray, TextureArray, HarmonyArray, Template
 from .compiler import ScoreTree
 from .plot import plot_notes
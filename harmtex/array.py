@@ -0,0 +1,727 @@
+from math import ceil, floor, lcm
+from typing import Collection, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from .model import frac, Pitch, Instrument, Note, Rhythm, Chord, Texture, Harmony, Instrumentation, _scale, _shift, \
+    _union
+from .timebase import to_times
+
+
+NOTE_DTYPE = np.dtype([('pitch', np.int64),
+                       ('onset', np.int64),
+                       ('duration', np.int64),
+                       ('instrument', np.int64)])
+
+# Rows of scores whose ticks do not fit in int64, held as Python ints
+OBJECT_NOTE_DTYPE = np.dtype([('pitch', np.int64),
+                              ('onset', object),
+                              ('duration', object),
+                              ('instrument', np.int64)])
+
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def tick_array(ticks: Iterable[int]) -> np.ndarray:
+    """
+    Ticks as an int64 array, or as an object array of Python ints when they do not fit in int64.
+    """
+    ticks = list(ticks)
+    try:
+        return np.array(ticks, dtype=np.int64)
+    except OverflowError:
+        return np.array(ticks, dtype=object)
+
+
+def _magnitude(ticks: np.ndarray) -> int:
+    if len(ticks) == 0:
+        return 0
+    return max(-int(ticks.min()), int(ticks.max()))
+
+
+def _affine(ticks: np.ndarray, factor: int = 1, step: int = 0) -> np.ndarray:
+    # ticks * factor + step, on Python ints when the result could leave int64
+    if factor == 1 and step == 0:
+        return ticks
+    if ticks.dtype != object and _magnitude(ticks) * abs(factor) + abs(step) > INT64_MAX:
+        ticks = ticks.astype(object)
+    return ticks * factor + step
+
+
+def _sum(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # a + b, on Python ints when the result could leave int64
+    if a.dtype != object and b.dtype != object and _magnitude(a) + _magnitude(b) > INT64_MAX:
+        a = a.astype(object)
+    return a + b
+
+
+def note_rows(pitch, onset: np.ndarray, duration: np.ndarray, instrument) -> np.ndarray:
+    """
+    Note rows from their columns, with Python int ticks if the onsets or durations are held as such.
+    """
+    exact = onset.dtype == object or duration.dtype == object
+    data = np.empty(len(onset), dtype=OBJECT_NOTE_DTYPE if exact else NOTE_DTYPE)
+    data['pitch'] = pitch
+    data['onset'] = onset
+    data['duration'] = duration
+    data['instrument'] = instrument
+    return data
+
+
+def contract(onsets: np.ndarray, durations: np.ndarray, hit_counts,
+             pitches: np.ndarray, pitch_counts,
+             instruments: np.ndarray, instrument_counts) -> np.ndarray:
+    """
+    Contract voices given as flat arrays into unique note rows.
+
+    Voice ``v`` owns the next ``hit_counts[v]`` hits, ``pitch_counts[v]`` pitches and ``instrument_counts[v]``
+    instrument codes of the flat arrays, and produces their Cartesian product. All voices are expanded at once
+    by indexing, so the cost does not depend on how the notes are split into voices.
+    """
+    hit_counts = np.asarray(hit_counts, dtype=np.int64)
+    pitch_counts = np.asarray(pitch_counts, dtype=np.int64)
+    instrument_counts = np.asarray(instrument_counts, dtype=np.int64)
+
+    sizes = hit_counts * pitch_counts * instrument_counts
+    total = int(sizes.sum())
+    if total == 0:
+        return np.empty(0, dtype=NOTE_DTYPE)
+
+    # Position of every row inside the product of its voice
+    voice = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    inner = (pitch_counts * instrument_counts)[voice]
+    hit = local // inner
+    pitch = (local % inner) // instrument_counts[voice]
+    instrument = local % instrument_counts[voice]
+
+    hit += (np.cumsum(hit_counts) - hit_counts)[voice]
+    pitch += (np.cumsum(pitch_counts) - pitch_counts)[voice]
+    instrument += (np.cumsum(instrument_counts) - instrument_counts)[voice]
+
+    return unique(note_rows(pitches[pitch], onsets[hit], durations[hit], instruments[instrument]))
+
+
+def unique(data: np.ndarray) -> np.ndarray:
+    """
+    Sort note rows by (pitch, onset, duration, instrument) and drop the duplicates.
+
+    The four columns are packed into a single integer key when their ranges fit in 63 bits.
+    """
+    if len(data) == 0:
+        return data
+    if data.dtype == OBJECT_NOTE_DTYPE:
+        return np.unique(data)
+
+    keys = np.zeros(len(data), dtype=np.int64)
+    bits = 0
+    for name in reversed(NOTE_DTYPE.names):
+        column = data[name] - data[name].min()
+        width = int(column.max()).bit_length()
+        bits += width
+        if bits > 63:
+            return np.unique(data)
+        keys |= column << (bits - width)
+
+    _, index = np.unique(keys, return_index=True)
+    return data[index]
+
+
+class NoteArray:
+    """
+    Columnar set of notes.
+
+    Onsets and durations are integer ticks on a shared timebase of ``resolution`` ticks per whole note, and
+    instruments are integer codes indexing ``instruments``. The rows are unique, like the sets returned by
+    ``TensorContraction.notes()``.
+    """
+    def __init__(self, data: np.ndarray, resolution: int = 1, instruments: List[Instrument] = None):
+        self.data = data
+        self.resolution = resolution
+        self.instruments = instruments if instruments is not None else []
+
+    @classmethod
+    def empty(cls) -> 'NoteArray':
+        return cls(np.empty(0, dtype=NOTE_DTYPE))
+
+    @classmethod
+    def from_voices(cls, voices: Iterable[Tuple[Rhythm, Chord, Collection[Instrument]]]) -> 'NoteArray':
+        voices = list(voices)
+        resolution = lcm(1, *{rhythm.resolution for rhythm, _, _ in voices})
+
+        onsets, durations, pitches, instruments = [], [], [], []
+        hit_counts, pitch_counts, instrument_counts = [], [], []
+        codes = {}
+        for rhythm, chord, group in voices:
+            ticks = rhythm.ticks(resolution)
+            onsets.extend(o for o, _ in ticks)
+            durations.extend(d for _, d in ticks)
+            pitches.extend(chord.numbers)
+            instruments.extend(codes.setdefault(i, len(codes)) for i in group)
+            hit_counts.append(len(ticks))
+            pitch_counts.append(len(chord))
+            instrument_counts.append(len(group))
+
+        data = contract(tick_array(onsets), tick_array(durations), hit_counts,
+                        np.array(pitches, dtype=np.int64), pitch_counts,
+                        np.array(instruments, dtype=np.int64), instrument_counts)
+        return cls(data, resolution, list(codes))
+
+    @classmethod
+    def from_factors(cls, harmony: Harmony, texture: Texture,
+                     groups: List[Collection[Instrument]]) -> 'NoteArray':
+        """
+        Notes of the voices of a harmony, a texture and instrument groups of the same length.
+
+        Array-backed factors are contracted from their flat arrays, without building their chords and rhythms.
+        """
+        texture = TextureArray.from_texture(texture)
+        hit_offsets, onsets, durations = texture._flat()
+        pitch_offsets, pitches = HarmonyArray.from_harmony(harmony)._flat()
+
+        codes = {}
+        instruments = [codes.setdefault(i, len(codes)) for group in groups for i in group]
+        data = contract(onsets, durations, np.diff(hit_offsets), pitches, np.diff(pitch_offsets),
+                        np.array(instruments, dtype=np.int64), [len(group) for group in groups])
+        return cls(data, texture.resolution, list(codes))
+
+    @classmethod
+    def from_notes(cls, notes: Iterable[Note]) -> 'NoteArray':
+        notes = list(notes)
+
+        resolution = 1
+        for note in notes:
+            resolution = lcm(resolution, note.onset.denominator, note.duration.denominator)
+
+        codes = {}
+        rows = [(note.pitch.number,
+                 note.onset.numerator * (resolution // note.onset.denominator),
+                 note.duration.numerator * (resolution // note.duration.denominator),
+                 codes.setdefault(note.instrument, len(codes)))
+                for note in notes]
+
+        try:
+            data = np.array(rows, dtype=NOTE_DTYPE)
+        except OverflowError:
+            data = np.array(rows, dtype=OBJECT_NOTE_DTYPE)
+        return cls(unique(data), resolution, list(codes))
+
+    @classmethod
+    def merge(cls, pieces: Iterable[Tuple['NoteArray', frac, int]]) -> 'NoteArray':
+        """
+        Union of note arrays, each one shifted in time and transposed by its own offsets.
+        """
+        pieces = [(notes, frac(shift), transposition) for notes, shift, transposition in pieces]
+        if len(pieces) == 0:
+            return cls.empty()
+        if len(pieces) == 1 and pieces[0][1] == 0 and pieces[0][2] == 0:
+            return pieces[0][0]
+
+        resolution = lcm(*(notes.resolution for notes, _, _ in pieces),
+                         *(shift.denominator for _, shift, _ in pieces))
+
+        codes = {}
+        columns = []
+        for notes, shift, transposition in pieces:
+            table = np.array([codes.setdefault(i, len(codes)) for i in notes.instruments], dtype=np.int64)
+            factor = resolution // notes.resolution
+            columns.append((notes.pitch + transposition,
+                            _affine(notes.onset, factor, shift.numerator * (resolution // shift.denominator)),
+                            _affine(notes.duration, factor),
+                            table[notes.instrument] if len(notes) != 0 else notes.instrument))
+
+        pitch, onset, duration, instrument = (np.concatenate(column) for column in zip(*columns))
+        return cls(unique(note_rows(pitch, onset, duration, instrument)), resolution, list(codes))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"NoteArray({len(self)} notes, resolution={self.resolution})"
+
+    @property
+    def pitch(self) -> np.ndarray:
+        return self.data['pitch']
+
+    @property
+    def onset(self) -> np.ndarray:
+        return self.data['onset']
+
+    @property
+    def duration(self) -> np.ndarray:
+        return self.data['duration']
+
+    @property
+    def instrument(self) -> np.ndarray:
+        return self.data['instrument']
+
+    @property
+    def start(self) -> frac:
+        return frac(int(self.onset.min()), self.resolution)
+
+    @property
+    def end(self) -> frac:
+        return frac(int((self.onset + self.duration).max()), self.resolution)
+
+    def rescale(self, resolution: int) -> 'NoteArray':
+        if resolution == self.resolution:
+            return self
+        if resolution % self.resolution != 0:
+            raise ValueError(f"Resolution {resolution} is not a multiple of {self.resolution}.")
+
+        factor = resolution // self.resolution
+        data = note_rows(self.pitch, _affine(self.onset, factor), _affine(self.duration, factor), self.instrument)
+        return NoteArray(data, resolution, self.instruments)
+
+    def shifted(self, shift: frac, transposition: int = 0) -> 'NoteArray':
+        """
+        Notes moved by ``shift`` in time and ``transposition`` in pitch.
+        """
+        shift = frac(shift)
+        if shift == 0 and transposition == 0:
+            return self
+
+        notes = self.rescale(lcm(self.resolution, shift.denominator))
+        data = note_rows(notes.pitch + transposition,
+                         _affine(notes.onset, 1, shift.numerator * (notes.resolution // shift.denominator)),
+                         notes.duration, notes.instrument)
+        return NoteArray(data, notes.resolution, notes.instruments)
+
+    def tile(self, times: int, period: frac) -> 'NoteArray':
+        """
+        Union of ``times`` copies of the notes, the k-th one shifted by ``k * period``.
+        """
+        period = frac(period)
+        notes = self.rescale(lcm(self.resolution, period.denominator))
+        step = period.numerator * (notes.resolution // period.denominator)
+
+        shifts = _affine(np.arange(times, dtype=np.int64), step)
+        onset = _sum(np.tile(notes.onset, times), np.repeat(shifts, len(notes)))
+        data = note_rows(np.tile(notes.pitch, times), onset, np.tile(notes.duration, times),
+                         np.tile(notes.instrument, times))
+        return NoteArray(unique(data), notes.resolution, notes.instruments)
+
+    def to_notes(self) -> Set[Note]:
+        times = to_times(np.unique(np.concatenate([self.onset, self.duration])).tolist(), self.resolution)
+
+        pitches = {p: Pitch._make(p) for p in np.unique(self.pitch).tolist()}
+
+        return {Note(pitches[p], times[o], times[d], self.instruments[i])
+                for p, o, d, i in self.data.tolist()}
+
+    def ordered(self) -> 'NoteArray':
+        # Same order as ordered_notes: onset, pitch, duration, then instrument name
+        names = np.argsort(np.argsort([instrument.name for instrument in self.instruments], kind='stable'))
+        rank = names[self.instrument] if len(self.instruments) != 0 else self.instrument
+        order = np.lexsort((rank, self.duration, self.pitch, self.onset))
+        return NoteArray(self.data[order], self.resolution, self.instruments)
+
+
+def _offsets(counts) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+class TextureArray(Texture):
+    """
+    Texture stored in compressed sparse rows.
+
+    The hits of voice ``v`` are at positions ``offsets[v]`` to ``offsets[v + 1]`` of the flat ``onset`` and
+    ``duration`` arrays, in ticks of ``resolution`` per whole note. Shifts, stretches and concatenations are
+    computed on the flat arrays, and slices are views sharing them. The rhythms are only built when
+    ``rhythms`` is read, so the object API keeps working on top of the arrays.
+    """
+    def __init__(self, offsets: np.ndarray, onset: np.ndarray, duration: np.ndarray, resolution: int = 1):
+        self.offsets = offsets
+        self.onset = onset
+        self.duration = duration
+        self.resolution = resolution
+
+    @classmethod
+    def from_texture(cls, texture: Texture) -> 'TextureArray':
+        if isinstance(texture, TextureArray):
+            return texture
+
+        resolution = lcm(1, *{rhythm.resolution for rhythm in texture.rhythms})
+        onsets, durations, counts = [], [], []
+        for rhythm in texture.rhythms:
+            ticks = rhythm.ticks(resolution)
+            onsets.extend(o for o, _ in ticks)
+            durations.extend(d for _, d in ticks)
+            counts.append(len(ticks))
+
+        result = cls(_offsets(counts), tick_array(onsets), tick_array(durations), resolution)
+        if '_extent' in texture.__dict__:
+            result._extent = texture._extent
+        return result
+
+    def _flat(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Offsets starting at 0 and the hits of the voices of this view only
+        first, last = int(self.offsets[0]), int(self.offsets[-1])
+        if first == 0 and last == len(self.onset):
+            return self.offsets, self.onset, self.duration
+        return self.offsets - first, self.onset[first:last], self.duration[first:last]
+
+    @property
+    def rhythms(self) -> List[Rhythm]:
+        try:
+            return self._rhythms
+        except AttributeError:
+            pass
+
+        offsets, onset, duration = self._flat()
+        offsets, onset, duration = offsets.tolist(), onset.tolist(), duration.tolist()
+        self._rhythms = [Rhythm._from_ticks(set(zip(onset[a:b], duration[a:b])), self.resolution)
+                         for a, b in zip(offsets[:-1], offsets[1:])]
+        return self._rhythms
+
+    def hit_counts(self) -> List[int]:
+        return np.diff(self.offsets).tolist()
+
+    @property
+    def extent(self) -> Optional[Tuple[frac, frac]]:
+        try:
+            return self._extent
+        except AttributeError:
+            pass
+
+        _, onset, duration = self._flat()
+        if len(onset) == 0:
+            self._extent = None
+        else:
+            self._extent = (frac(int(onset.min()), self.resolution),
+                            frac(int(_sum(onset, duration).max()), self.resolution))
+        return self._extent
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                result = TextureArray(self.offsets[start:max(start, stop) + 1], self.onset, self.duration,
+                                      self.resolution)
+                if stop - start == len(self):
+                    result._extent = self.extent
+                return result
+        return super().__getitem__(key)
+
+    def __add__(self, other):
+        if isinstance(other, Texture):
+            return TextureArray.parallelize(self, other)
+        if not isinstance(other, (frac, int)):
+            return super().__add__(other)
+
+        resolution = lcm(self.resolution, other.denominator)
+        factor = resolution // self.resolution
+        step = other.numerator * (resolution // other.denominator)
+        offsets, onset, duration = self._flat()
+        result = TextureArray(offsets, _affine(onset, factor, step), _affine(duration, factor), resolution)
+        result._extent = _shift(self.extent, other)
+        return result
+
+    def __sub__(self, other: Texture) -> 'TextureArray':
+        return TextureArray.concatenate(self, other)
+
+    def __mul__(self, other):
+        if not isinstance(other, (frac, int)):
+            return super().__mul__(other)
+
+        offsets, onset, duration = self._flat()
+        result = TextureArray(offsets, _affine(onset, other.numerator), _affine(duration, other.numerator),
+                              self.resolution * other.denominator)
+        if other >= 0:
+            result._extent = _scale(self.extent, other)
+        return result
+
+    @classmethod
+    def concatenate(cls, *textures: Texture) -> 'TextureArray':
+        # Each texture is shifted by the sum of the previous endpoints, as with -
+        textures = [cls.from_texture(t) for t in textures]
+        shifts = []
+        offset = frac(0)
+        for texture in textures:
+            shifts.append(offset)
+            offset += texture.endpoint
+        return cls._join(textures, shifts)
+
+    @classmethod
+    def parallelize(cls, *textures: Texture) -> 'TextureArray':
+        textures = [cls.from_texture(t) for t in textures]
+        return cls._join(textures, [frac(0)] * len(textures))
+
+    @classmethod
+    def _join(cls, textures: List['TextureArray'], shifts: List[frac]) -> 'TextureArray':
+        resolution = lcm(1, *(t.resolution for t in textures), *(s.denominator for s in shifts))
+        counts, onsets, durations = [], [], []
+        extent = None
+        for texture, shift in zip(textures, shifts):
+            offsets, onset, duration = texture._flat()
+            factor = resolution // texture.resolution
+            counts.append(np.diff(offsets))
+            onsets.append(_affine(onset, factor, shift.numerator * (resolution // shift.denominator)))
+            durations.append(_affine(duration, factor))
+            extent = _union(extent, _shift(texture.extent, shift))
+
+        result = cls(_offsets(np.concatenate(counts) if counts else []),
+                     np.concatenate(onsets) if onsets else np.empty(0, dtype=np.int64),
+                     np.concatenate(durations) if durations else np.empty(0, dtype=np.int64), resolution)
+        result._extent = extent
+        return result
+
+
+class HarmonyArray(Harmony):
+    """
+    Harmony stored in compressed sparse rows: the pitches of chord ``c`` are at positions ``offsets[c]`` to
+    ``offsets[c + 1]`` of the flat ``pitch`` array.
+
+    Transpositions and concatenations are computed on the flat array, slices are views sharing it, and
+    ``chords`` is only built when read.
+    """
+    def __init__(self, offsets: np.ndarray, pitch: np.ndarray):
+        self.offsets = offsets
+        self.pitch = pitch
+
+    @classmethod
+    def from_harmony(cls, harmony: Harmony) -> 'HarmonyArray':
+        if isinstance(harmony, HarmonyArray):
+            return harmony
+
+        pitches = [n for chord in harmony.chords for n in chord.numbers]
+        return cls(_offsets([len(chord) for chord in harmony.chords]), np.array(pitches, dtype=np.int64))
+
+    @classmethod
+    def _from_rows(cls, rows: List[Tuple[int, ...]], ids: List[int], octaves, split: bool = False) -> 'HarmonyArray':
+        # Chord c has the pitches of rows[ids[c]], moved by octaves[c], or a chord per pitch when split
+        ids = np.array(ids, dtype=np.int64)
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        table = np.array([p for row in rows for p in row], dtype=np.int64)
+
+        counts = lengths[ids]
+        offsets = _offsets(counts)
+        local = np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1], counts)
+        pitch = table[np.repeat((np.cumsum(lengths) - lengths)[ids], counts) + local]
+        pitch += np.repeat(12 * np.broadcast_to(np.asarray(octaves, dtype=np.int64), ids.shape), counts)
+        if split:
+            offsets = np.arange(len(pitch) + 1, dtype=np.int64)
+        return cls(offsets, pitch)
+
+    def _flat(self) -> Tuple[np.ndarray, np.ndarray]:
+        first, last = int(self.offsets[0]), int(self.offsets[-1])
+        if first == 0 and last == len(self.pitch):
+            return self.offsets, self.pitch
+        return self.offsets - first, self.pitch[first:last]
+
+    @property
+    def chords(self) -> List[Chord]:
+        try:
+            return self._chords
+        except AttributeError:
+            pass
+
+        offsets, pitch = self._flat()
+        offsets, pitch = offsets.tolist(), pitch.tolist()
+        self._chords = [Chord._from_numbers(pitch[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+        return self._chords
+
+    def pitch_counts(self) -> List[int]:
+        return np.diff(self.offsets).tolist()
+
+    def pitch_range(self, voices: List[bool] = None) -> Optional[Tuple[int, int]]:
+        offsets, pitch = self._flat()
+        if voices is not None:
+            pitch = pitch[np.repeat(np.array(voices, dtype=bool), np.diff(offsets))]
+        if len(pitch) == 0:
+            return None
+        return int(pitch.min()), int(pitch.max())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return HarmonyArray(self.offsets[start:max(start, stop) + 1], self.pitch)
+        return super().__getitem__(key)
+
+    def __add__(self, other):
+        if isinstance(other, Harmony):
+            return HarmonyArray.concatenate(self, other)
+        if not isinstance(other, int):
+            return super().__add__(other)
+
+        offsets, pitch = self._flat()
+        return HarmonyArray(offsets, pitch + other)
+
+    @classmethod
+    def concatenate(cls, *harmonies: Harmony) -> 'HarmonyArray':
+        harmonies = [cls.from_harmony(h)._flat() for h in harmonies]
+        if len(harmonies) == 0:
+            return cls(_offsets([]), np.empty(0, dtype=np.int64))
+        return cls(_offsets(np.concatenate([np.diff(offsets) for offsets, _ in harmonies])),
+                   np.concatenate([pitch for _, pitch in harmonies]))
+
+
+class Template:
+    """
+    Texture and instrumentation contracted ahead of the harmony.
+
+    Every hit of a voice is paired with every instrument of its section once, so that contracting a harmony only
+    adds the pitches. ``contract_batch`` contracts many harmonies of one pitch per voice at once, from a 2-D
+    array with a row per harmony and a column per voice.
+    """
+    def __init__(self, texture: Texture, instrumentation: Instrumentation):
+        if len(texture) != len(instrumentation):
+            raise ValueError(f"Texture and instrumentation have different lengths; "
+                             f"Texture: {len(texture)}, Instrumentation: {len(instrumentation)}")
+
+        texture = TextureArray.from_texture(texture)
+        hit_offsets, onset, duration = texture._flat()
+        hit_counts = np.diff(hit_offsets)
+
+        codes = {}
+        instruments = np.array([codes.setdefault(i, len(codes)) for s in instrumentation.sections
+                                for i in s.instruments], dtype=np.int64)
+        instrument_counts = np.array([len(s.instruments) for s in instrumentation.sections], dtype=np.int64)
+
+        # Pairs of a voice: its hits, each one with all the instruments of the section
+        pair_counts = hit_counts * instrument_counts
+        pair_voice = np.repeat(np.arange(len(pair_counts), dtype=np.int64), pair_counts)
+        local = np.arange(len(pair_voice)) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        hit = local // instrument_counts[pair_voice] + (np.cumsum(hit_counts) - hit_counts)[pair_voice]
+        instrument = local % instrument_counts[pair_voice] + (np.cumsum(instrument_counts) -
+                                                              instrument_counts)[pair_voice]
+
+        self.resolution = texture.resolution
+        self.instruments = list(codes)
+        self.pair_offsets = _offsets(pair_counts)
+        self.voice = pair_voice
+        self.onset = onset[hit]
+        self.duration = duration[hit]
+        self.instrument = instruments[instrument]
+
+    def __len__(self):
+        return len(self.pair_offsets) - 1
+
+    def __repr__(self):
+        return f"Template({len(self)} voices, {len(self.onset)} pairs, resolution={self.resolution})"
+
+    def contract(self, harmony: Harmony) -> NoteArray:
+        """
+        Notes of the template with a harmony, as ``TensorContraction(harmony, texture, instrumentation)``.
+        """
+        if len(harmony) != len(self):
+            raise ValueError(f"The harmony has {len(harmony)} chords for {len(self)} voices.")
+
+        pitch_offsets, pitches = HarmonyArray.from_harmony(harmony)._flat()
+        pitch_counts = np.diff(pitch_offsets)
+        pair_counts = np.diff(self.pair_offsets)
+
+        sizes = pair_counts * pitch_counts
+        from .cache import note_cache
+        note_cache.check_budget(int(sizes.sum()))
+        voice = np.repeat(np.arange(len(sizes), dtype=np.int64), sizes)
+        local = np.arange(len(voice)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        pair = local // pitch_counts[voice] + self.pair_offsets[voice]
+        pitch = local % pitch_counts[voice] + pitch_offsets[voice]
+
+        data = note_rows(pitches[pitch], self.onset[pair], self.duration[pair], self.instrument[pair])
+        return NoteArray(unique(data), self.resolution, self.instruments)
+
+    def contract_batch(self, pitches) -> List[NoteArray]:
+        """
+        Notes of the template with each row of pitches, the harmony with one pitch per voice.
+
+        ``pitches`` is a 2-D array with a column per voice, or a list of such harmonies. All the rows are
+        expanded, sorted and deduplicated in a single pass.
+        """
+        if not isinstance(pitches, np.ndarray):
+            pitches = self._pitch_rows(pitches)
+        pitches = np.asarray(pitches, dtype=np.int64).reshape(-1, len(self))
+        rows, pairs = len(pitches), len(self.onset)
+        from .cache import note_cache
+        note_cache.check_budget(rows * pairs)
+
+        data = note_rows(pitches[:, self.voice].reshape(-1), np.tile(self.onset, rows), np.tile(self.duration, rows),
+                         np.tile(self.instrument, rows))
+        row = np.repeat(np.arange(rows, dtype=np.int64), pairs)
+
+        # Same order as unique, within each row
+        order = np.lexsort((data['instrument'], data['duration'], data['onset'], data['pitch'], row))
+        data, row = data[order], row[order]
+        if len(data) != 0:
+            keep = np.ones(len(data), dtype=bool)
+            keep[1:] = (data[1:] != data[:-1]) | (row[1:] != row[:-1])
+            data, row = data[keep], row[keep]
+
+        bounds = np.searchsorted(row, np.arange(rows + 1)).tolist()
+        return [NoteArray(data[a:b], self.resolution, self.instruments) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def _pitch_rows(self, harmonies: Iterable[Harmony]) -> np.ndarray:
+        rows = []
+        for harmony in harmonies:
+            pitch_offsets, pitches = HarmonyArray.from_harmony(harmony)._flat()
+            if len(harmony) != len(self) or np.any(np.diff(pitch_offsets) != 1):
+                raise ValueError("Batched harmonies must have one pitch per voice.")
+            rows.append(pitches)
+        return np.array(rows, dtype=np.int64).reshape(-1, len(self))
+
+    def to_midi(self, harmony: Harmony, velocity=64, bpm=100):
+        from .midi import to_midi
+        return to_midi(self.contract(harmony), velocity, bpm)
+
+
+class IntervalIndex:
+    """
+    Hits of a list of rhythms sorted by onset within buckets of durations up to a factor 2, for time-window queries.
+
+    In a bucket, the hits sounding in a window have an onset between the start minus the longest duration of the
+    bucket and the end, found by two binary searches. The hits read before the window all sound at one earlier
+    instant, so a long hit does not make a query scan every hit before it.
+    """
+    def __init__(self, rhythms: List[Rhythm]):
+        self.resolution = lcm(1, *{rhythm.resolution for rhythm in rhythms})
+
+        onsets, durations, counts = [], [], []
+        for rhythm in rhythms:
+            ticks = rhythm.ticks(self.resolution)
+            onsets.extend(o for o, _ in ticks)
+            durations.extend(d for _, d in ticks)
+            counts.append(len(ticks))
+
+        onsets, durations = tick_array(onsets), tick_array(durations)
+        bucket = np.frexp(durations.astype(np.float64))[1]
+        order = np.lexsort((onsets, bucket))
+        self.onset = onsets[order]
+        self.duration = durations[order]
+        self.voice = np.repeat(np.arange(len(rhythms), dtype=np.int64), counts)[order]
+
+        # Bounds of the buckets in the sorted hits, and their longest duration
+        bucket = bucket[order]
+        self.bounds = np.flatnonzero(np.diff(bucket, prepend=-1, append=-1)).tolist()
+        self.reach = [int(self.duration[b:e].max()) for b, e in zip(self.bounds, self.bounds[1:])]
+
+    def __len__(self):
+        return len(self.onset)
+
+    def query(self, start: frac, end: frac) -> np.ndarray:
+        """
+        Positions of the hits with onset < end and onset + duration > start, in increasing order.
+        """
+        start_ticks = floor(frac(start) * self.resolution)
+        end_ticks = ceil(frac(end) * self.resolution)
+
+        ranges = []
+        for first, last, reach in zip(self.bounds, self.bounds[1:], self.reach):
+            onsets = self.onset[first:last]
+            low = first + int(np.searchsorted(onsets, start_ticks - reach, side='right'))
+            high = first + int(np.searchsorted(onsets, end_ticks, side='left'))
+            if low < high:
+                ranges.append(np.arange(low, high))
+        if len(ranges) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        positions = np.concatenate(ranges)
+        return positions[_sum(self.onset[positions], self.duration[positions]) > start_ticks]
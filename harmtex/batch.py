@@ -0,0 +1,148 @@
+"""
+Compile XML scores to MIDI files in a pool of processes.
+
+    python -m harmtex.batch xml/ other/score.xml -o midi -j 8
+
+Directories are searched recursively for ``*.xml`` files, and the MIDI files keep their layout, as well as the
+layout of the files given below their common directory. A score that fails to compile is reported and does not
+stop the others, and the run ends with the time spent in each stage.
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+STAGES = ['parse', 'decode', 'contract', 'write']
+
+
+class Result(NamedTuple):
+    source: Path
+    target: Path
+    timings: Dict[str, float]
+    error: Optional[str] = None
+
+
+def find_scores(paths: Iterable[Path], output: Path) -> List[Tuple[Path, Path]]:
+    # Scores with their MIDI file, keeping the layout of the directories given, and of the files given below their
+    # common directory
+    paths = list(map(Path, paths))
+    files = [path.resolve() for path in paths if not path.is_dir()]
+    common = Path(os.path.commonpath([path.parent for path in files])) if len(files) != 0 else None
+    jobs = []
+    for path in paths:
+        if path.is_dir():
+            jobs.extend((source, output / source.relative_to(path).with_suffix('.mid'))
+                        for source in sorted(path.rglob('*.xml')))
+        else:
+            jobs.append((path, output / path.resolve().relative_to(common).with_suffix('.mid')))
+    return jobs
+
+
+def positive(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive number, got {value}")
+    return number
+
+
+def compile_score(source: Path, target: Path, velocity: int = 50, streaming: bool = False,
+                  backend: Optional[str] = None, validate: bool = False) -> Result:
+    from .compiler import ScoreTree
+
+    timings = {}
+    try:
+        score_tree = ScoreTree(source, streaming=streaming, backend=backend, validate=validate)
+        timings.update(score_tree.timings)
+
+        start = time.perf_counter()
+        notes = score_tree.ast.to_note_array()
+        timings['contract'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        score_tree.to_midi(velocity, notes).write(str(target))
+        timings['write'] = time.perf_counter() - start
+    except Exception:
+        return Result(source, target, timings, traceback.format_exc())
+    return Result(source, target, timings)
+
+
+def compile_scores(jobs: List[Tuple[Path, Path]], workers: Optional[int] = None, velocity: int = 50,
+                   streaming: bool = False, backend: Optional[str] = None, validate: bool = False) -> Iterable[Result]:
+    """
+    Results of the scores in the order they are compiled.
+
+    With a single worker, the scores are compiled in this process. If a worker process dies, the scores it left
+    are reported as failed.
+    """
+    if workers == 1:
+        for source, target in jobs:
+            yield compile_score(source, target, velocity, streaming, backend, validate)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(compile_score, source, target, velocity, streaming, backend, validate):
+                   (source, target) for source, target in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception:
+                yield Result(*futures[future], {}, traceback.format_exc())
+
+
+def summary(results: List[Result], elapsed: float) -> str:
+    failed = [result for result in results if result.error is not None]
+    lines = [f"{len(results) - len(failed)} compiled, {len(failed)} failed in {elapsed:.3f} s", '',
+             f"{'stage':>10} {'total (s)':>10} {'mean (ms)':>10} {'max (ms)':>10}"]
+    for stage in STAGES:
+        times = [result.timings[stage] for result in results if stage in result.timings]
+        if len(times) != 0:
+            lines.append(f"{stage:>10} {sum(times):>10.3f} {1000 * sum(times) / len(times):>10.1f} "
+                         f"{1000 * max(times):>10.1f}")
+
+    if len(failed) != 0:
+        lines.append('')
+        lines.extend(f"{result.source}: {result.error.strip().splitlines()[-1]}" for result in failed)
+    return '\n'.join(lines)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m harmtex.batch', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', type=Path, help="XML scores, or directories of them")
+    parser.add_argument('-o', '--output', type=Path, default=Path('midi'), help="directory of the MIDI files")
+    parser.add_argument('-j', '--jobs', type=positive, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--velocity', type=int, default=50)
+    parser.add_argument('--streaming', action='store_true', help="decode the scores while parsing them")
+    parser.add_argument('--backend', choices=['etree', 'lxml'], help="XML parser (etree by default)")
+    parser.add_argument('--validate', action='store_true', help="check the scores against score.xsd (needs lxml)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print each score and full tracebacks")
+    options = parser.parse_args(arguments)
+
+    jobs = find_scores(options.paths, options.output)
+    counts = Counter(target for _, target in jobs)
+    duplicates = sorted(str(target) for target, count in counts.items() if count > 1)
+    if len(duplicates) != 0:
+        parser.error(f"several scores would be written to {', '.join(duplicates)}")
+    start = time.perf_counter()
+    results = []
+    for result in compile_scores(jobs, options.jobs, options.velocity, options.streaming,
+                                 options.backend, options.validate):
+        results.append(result)
+        if result.error is not None:
+            print(f"FAILED {result.source}", file=sys.stderr)
+            if options.verbose:
+                print(result.error, file=sys.stderr)
+        elif options.verbose:
+            print(f"{result.source} -> {result.target}")
+    print(summary(results, time.perf_counter() - start))
+    return 0 if all(result.error is None for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from math import gcd, lcm
+from typing import Callable, Collection, Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+from .model import frac, Rhythm, Chord, Instrument
+from .array import NoteArray, TextureArray, HarmonyArray, _affine
+
+
+Fingerprint = Tuple[Hashable, frac, int]
+
+
+def fingerprint(voices: Iterable[Tuple[Rhythm, Chord, Collection[Instrument]]]) -> Fingerprint:
+    """
+    Structure of the notes of the voices, up to a shift in time and a transposition.
+
+    Returns a hashable key, the earliest onset and the lowest pitch. Voices with the same key have the same notes
+    once moved to start at time 0 on pitch 0. The key is made of the shapes of the rhythms and chords, which are
+    cached on them and kept by the operators, so it takes a single pass over the voices.
+    """
+    voices = [(rhythm, chord, group) for rhythm, chord, group in voices
+              if rhythm.extent is not None and len(chord) != 0 and len(group) != 0]
+    if len(voices) == 0:
+        return (), frac(0), 0
+
+    resolution = lcm(1, *{rhythm.resolution for rhythm, _, _ in voices})
+    names = {}
+    shapes = []
+    for rhythm, chord, group in voices:
+        rhythm_shape, start = rhythm.shape
+        chord_shape, low = chord.shape
+        try:
+            group_names = names[id(group)]
+        except KeyError:
+            group_names = names[id(group)] = frozenset(i.name for i in group)
+        shapes.append((rhythm_shape, start * (resolution // rhythm.resolution), chord_shape, low, group_names))
+
+    first = min(start for _, start, _, _, _ in shapes)
+    lowest = min(low for _, _, _, low, _ in shapes)
+
+    # Offsets on the coarsest grid, so that the key does not depend on the resolutions of the rhythms
+    divisor = gcd(resolution, *(start - first for _, start, _, _, _ in shapes))
+    key = tuple((rhythm_shape, (start - first) // divisor, chord_shape, low - lowest, group_names)
+                for rhythm_shape, start, chord_shape, low, group_names in shapes)
+    return key + (resolution // divisor,), frac(first, resolution), lowest
+
+
+def _key(column: np.ndarray) -> Hashable:
+    # Bytes of an int64 column; Python int ticks are compared by value
+    if column.dtype == object:
+        return tuple(column.tolist())
+    return column.tobytes()
+
+
+def fingerprint_arrays(harmony: HarmonyArray, texture: TextureArray,
+                       groups: List[Collection[Instrument]]) -> Fingerprint:
+    """
+    Fingerprint of the voices of array-backed factors, computed on their flat arrays.
+
+    The key holds the arrays moved to time 0 and pitch 0, in storage order: it never matches a key of
+    ``fingerprint``, and equal voices stored in another order only miss the cache.
+    """
+    hit_offsets, onset, duration = texture._flat()
+    pitch_offsets, pitch = harmony._flat()
+    hit_counts, pitch_counts = np.diff(hit_offsets), np.diff(pitch_offsets)
+
+    names = {}
+    group_names = []
+    for group in groups:
+        try:
+            group_names.append(names[id(group)])
+        except KeyError:
+            group_names.append(names.setdefault(id(group), frozenset(i.name for i in group)))
+
+    active = (hit_counts != 0) & (pitch_counts != 0) & np.array([len(n) != 0 for n in group_names], dtype=bool)
+    if not active.any():
+        return (), frac(0), 0
+    if not active.all():
+        onset, duration = onset[np.repeat(active, hit_counts)], duration[np.repeat(active, hit_counts)]
+        pitch = pitch[np.repeat(active, pitch_counts)]
+        hit_counts, pitch_counts = hit_counts[active], pitch_counts[active]
+        group_names = [n for n, a in zip(group_names, active.tolist()) if a]
+
+    first = int(onset.min())
+    lowest = int(pitch.min())
+    onset = _affine(onset, 1, -first)
+    divisor = int(np.gcd.reduce(np.concatenate([[texture.resolution], onset, duration])))
+    key = ('arrays', texture.resolution // divisor, hit_counts.tobytes(), _key(onset // divisor),
+           _key(duration // divisor), pitch_counts.tobytes(), (pitch - lowest).tobytes(), tuple(group_names))
+    return key, frac(first, texture.resolution), lowest
+
+
+class NoteCache:
+    """
+    Least recently used note arrays, keyed by fingerprint.
+
+    The notes are stored moved to time 0 and pitch 0, so that shifted and transposed copies of a block share an
+    entry. Entries are evicted once their total size exceeds ``max_bytes``. Contractions estimated to produce
+    more than ``max_notes`` notes are refused before they are computed.
+    """
+    def __init__(self, max_bytes: int = 64 * 2 ** 20, max_notes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_notes = max_notes
+        self.entries: Dict[Hashable, NoteArray] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"NoteCache({len(self)} entries, {self.bytes} / {self.max_bytes} bytes)"
+
+    def materialize(self, voices_fingerprint: Fingerprint, compute: Callable[[], NoteArray]) -> NoteArray:
+        key, shift, transposition = voices_fingerprint
+        try:
+            notes = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            notes = compute()
+            self.put(key, notes.shifted(-shift, -transposition))
+            return notes
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return notes.shifted(shift, transposition)
+
+    def check_budget(self, note_count: int):
+        if self.max_notes is not None and note_count > self.max_notes:
+            raise ValueError(f"Materializing {note_count} notes exceeds the budget of {self.max_notes} notes.")
+
+    def put(self, key: Hashable, notes: NoteArray):
+        size = notes.data.nbytes
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key).data.nbytes
+        self.entries[key] = notes
+        self.bytes += size
+        self.resize(self.max_bytes)
+
+    def resize(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        while self.bytes > self.max_bytes:
+            _, notes = self.entries.popitem(last=False)
+            self.bytes -= notes.data.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'max_notes': self.max_notes}
+
+
+note_cache = NoteCache()
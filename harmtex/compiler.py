@@ -1,34 +1,481 @@
+import hashlib
+import mmap
+import os
+import time
+from contextlib import contextmanager
+from math import lcm
 from pathlib import Path
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
 import xml.etree.ElementTree as ET
+import xml.parsers.expat as expat
 from .model import frac, \
     Hit, Rhythm, Texture, \
     Pitch, Chord, Harmony, \
     Instrument, Section, Instrumentation, \
     TensorContraction
+from .functions import concatenation, parallelization
+from .xmlbackend import Backend, get_backend
+
+
+# Blocks of definitions, each child of which has an id
+DEFINITION_BLOCKS = ['hits', 'rhythms', 'textures',
+                     'pitches', 'chords', 'harmonies',
+                     'instruments', 'sections', 'instrumentations']
+
+
+# Tags whose element can be a reference to a definition, given as a first child <id>
+REFERENCE_TAGS = {'hit', 'rhythm', 'texture', 'pitch', 'chord', 'harmony', 'section', 'instrumentation',
+                  'product', 'parallel', 'concatenate'}
+
+
+def _iter_closed(file_path: Path, backend: Backend, validate: bool = False):
+    # Elements as they close, with their parent (None for the root) and their depth
+    stack = []
+    for event, element in backend.iterparse(file_path, events=('start', 'end'), validate=validate):
+        if event == 'start':
+            stack.append(element)
+        else:
+            stack.pop()
+            yield element, stack[-1] if stack else None, len(stack)
+
+
+# Key of the ast in the dependency graph
+AST = '<ast>'
+
+
+def _digests(element: ET.Element):
+    # Digest of the content of the element and of each element with an id inside it. Each one hashes a contiguous
+    # range of the elements in document order, with their number of children so that the structure is kept, and
+    # without recursion; whitespace around the texts is ignored
+    elements = list(element.iter())
+    parts = [f"{e.tag}\0{e.items()}\0{(e.text or '').strip()}\0{(e.tail or '').strip()}\0{len(e)}" for e in elements]
+    digests = []
+    for index, e in enumerate(elements):
+        if index == 0 or e.attrib.get('id') is not None:
+            end = index + sum(1 for _ in e.iter())
+            digest = hashlib.blake2b('\1'.join(parts[index:end]).encode(), digest_size=16)
+            digests.append((e, digest.hexdigest()))
+    return digests
+
+
+def _references(element: ET.Element) -> Set[str]:
+    return {e.text for e in element.iter('id')}
+
+
+def _records(key: Optional[str], element: ET.Element) -> Tuple[Tuple[str, FrozenSet[str], str], ...]:
+    # Name, references and digest of the unit and of the definitions nested in it, none for the metadata
+    if key is None:
+        return ()
+    return tuple((key if e is element else e.attrib['id'], frozenset(_references(e)), digest)
+                 for e, digest in _digests(element))
+
+
+class Unit(NamedTuple):
+    """
+    Top-level element of a score file: a definition (``key`` is its id, ``block`` the tag of its block), the ast
+    (``AST``) or a metadata element (None), with the ``records`` of the dependency graph found in it.
+
+    Units read from the bytes of the file also know where they are: the element spans the bytes from ``start`` to
+    ``stop``, and the unit covers the bytes from the end of the previous unit (the beginning of the file for the first
+    one) to ``end`` (the end of the file for the last one). ``source`` is the digest of the covered bytes and
+    ``resolution`` the timebase of the times in it.
+    """
+    key: Optional[str]
+    block: Optional[str]
+    tag: str
+    records: Tuple[Tuple[str, FrozenSet[str], str], ...] = ()
+    start: Optional[int] = None
+    stop: Optional[int] = None
+    end: Optional[int] = None
+    source: Optional[str] = None
+    resolution: int = 1
+
+
+def _source(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@contextmanager
+def _mapped(file_path: Path):
+    # Bytes of a file, read by the system as they are used
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _declaration(data) -> bytes:
+    # XML declaration of a file, with which its units are parsed on their own
+    return bytes(data[:data.find(b'?>') + 2]) if data[:5] == b'<?xml' else b''
+
+
+def _scan(data, begin: int = 0, end: Optional[int] = None, path: Tuple[str, ...] = ()) -> Tuple[List[Unit], List[str]]:
+    # Units covering data[begin:end] and the tags open at its end, read by expat without building any element; path
+    # holds the tags open at begin
+    end = len(data) if end is None else end
+    opening = ''.join(f'<{tag}>' for tag in path).encode()
+    offset = begin - len(opening)
+    parser = expat.ParserCreate()
+    spans, stack, pending = [], [], []
+
+    def close(position):
+        if pending:
+            key, block, tag, start, denominators = pending.pop()
+            spans.append((key, block, tag, start, position, lcm(1, *denominators)))
+
+    def start_element(tag, attributes):
+        depth = len(stack)
+        if depth == 2 and stack[1] in DEFINITION_BLOCKS:
+            close(parser.CurrentByteIndex + offset)
+            pending.append((attributes['id'], stack[1], tag, parser.CurrentByteIndex + offset, set()))
+        elif depth == 1:
+            close(parser.CurrentByteIndex + offset)
+            if tag not in DEFINITION_BLOCKS:
+                pending.append((AST if tag == 'ast' else None, None, tag, parser.CurrentByteIndex + offset, set()))
+        if tag in ['onset', 'duration'] and pending:
+            pending[-1][4].add(int(attributes['den']))
+        stack.append(tag)
+
+    def end_element(tag):
+        stack.pop()
+        if len(stack) == 0 or len(stack) == 1 and tag in DEFINITION_BLOCKS:
+            close(parser.CurrentByteIndex + offset)
+
+    parser.StartElementHandler, parser.EndElementHandler = start_element, end_element
+    parser.Parse(opening, False)
+    parser.Parse(memoryview(data)[begin:end], end == len(data))
+    close(end)
+
+    units = []
+    for index, (key, block, tag, start, stop, resolution) in enumerate(spans):
+        cover = spans[index + 1][3] if index + 1 < len(spans) else end
+        units.append(Unit(key, block, tag, (), start, stop, cover, _source(memoryview(data)[begin:cover]), resolution))
+        begin = cover
+    return units, stack
 
 
 class ScoreTree:
-    def __init__(self, file_path: Path):
+    def __init__(self, file_path: Path, streaming: bool = False, cache=None, backend=None, validate: bool = False):
+        """
+        Score decoded from an XML file.
+
+        With ``streaming``, the file is read with ``iterparse`` and each definition is decoded and dropped as soon
+        as it closes, so the whole document is never held in memory; ``tree`` and ``root`` are then None.
+
+        With a ``cache`` (a ScoreCache, or True for ``scorecache.score_cache``), a score compiled before from the
+        same bytes is loaded without parsing the XML, and ``cache_status`` tells whether it was a 'hit' or a
+        'miss'. Validated scores have their own entries, so a hit with ``validate`` was validated when compiled.
+
+        The XML is read by a ``backend`` of ``xmlbackend`` (a Backend or its name; the stdlib one by default).
+        With ``validate``, the file is checked against ``score.xsd`` when it is parsed, which needs lxml.
+        """
         # File path
         self.file_path = file_path
 
+        # XML parser
+        self.backend = backend if isinstance(backend, Backend) else get_backend(backend)
+        self.validate = validate
+
         # Metadata
-        self.title = ''
-        self.composer = ''
-        self.tempo = ScoreTree.Tempo(frac(1, 4), 100)
-        self.time_signature = ScoreTree.TimeSignature(4, 4)
-        self.anacrusis = frac(0, 1)
+        self._default_metadata(self.METADATA)
 
         # Objects
         self.objects = {}
 
+        # Dependency graph: ids referenced by each definition, nested ones included (and by the ast, under ``AST``),
+        # with digests of their contents
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.digests: Dict[str, str] = {}
+
+        # Units of the file in document order, which let an update parse and digest only the changed ones once their
+        # bytes are known (from the streaming first pass, or else from the first update)
+        self.units: List[Unit] = []
+
+        self.ast = None
+        self.tree = None
+        self.root = None
+        self.cache_status = None
+
+        # Seconds spent in each stage of the compilation ('parse', 'decode', or 'load' from the cache)
+        self.timings = {}
+        if cache is None:
+            self._compile(streaming)
+            return
+
+        from .scorecache import score_cache
+        if cache is True:
+            cache = score_cache
+        start = time.perf_counter()
+        key = cache.key(Path(file_path).read_bytes(), validate)
+        state = cache.load(key)
+        if state is not None:
+            self.__dict__.update(state)
+            self.cache_status = 'hit'
+            self.timings['load'] = time.perf_counter() - start
+            return
+
+        self.cache_status = 'miss'
+        self._compile(streaming)
+        cache.store(key, {name: getattr(self, name) for name in self.COMPILED})
+
+    # Tags of the metadata
+    METADATA = ['title', 'composer', 'tempo', 'time-signature', 'anacrusis']
+
+    def _default_metadata(self, tags):
+        # Values of the metadata missing from the score
+        defaults = {
+            'title': ('title', ''),
+            'composer': ('composer', ''),
+            'tempo': ('tempo', ScoreTree.Tempo(frac(1, 4), 100)),
+            'time-signature': ('time_signature', ScoreTree.TimeSignature(4, 4)),
+            'anacrusis': ('anacrusis', frac(0, 1)),
+        }
+        for tag in tags:
+            setattr(self, *defaults[tag])
+
+    # Attributes restored from a score cache
+    COMPILED = ['title', 'composer', 'tempo', 'time_signature', 'anacrusis', 'resolution', 'objects', 'ast',
+                'dependencies', 'digests', 'units']
+
+    def _compile(self, streaming: bool):
+        if streaming:
+            self._stream()
+            return
+
         # Parse XML
-        self.tree = ET.parse(file_path)
+        start = time.perf_counter()
+        self.tree = self.backend.parse(self.file_path, self.validate)
         self.root = self.tree.getroot()
+        self.timings['parse'] = time.perf_counter() - start
+
+        # Timebase shared by all the rhythms of the score
+        start = time.perf_counter()
+        self.resolution = lcm(1, *{int(e.attrib['den']) for tag in ['onset', 'duration'] for e in self.root.iter(tag)})
 
         # Decode XML
-        self.ast = None
         self.decode(self.root)
+        self.units = [Unit(key, block, element.tag, _records(key, element))
+                      for key, block, element in self._elements(self.root)]
+        self._merge()
+        self.timings['decode'] = time.perf_counter() - start
+
+    def _stream(self):
+        # The timebase needs every denominator before the first rhythm is decoded, so it is read by a first pass
+        # which builds no element
+        start = time.perf_counter()
+        with _mapped(self.file_path) as data:
+            try:
+                units, _ = _scan(data)
+            except expat.ExpatError as error:
+                self._parse_error(self.file_path, error)
+        self.resolution = lcm(1, *(unit.resolution for unit in units))
+        self.timings['parse'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            self._decode_stream(units, self.backend)
+        except Exception as error:
+            if not self.backend.too_deep(error, self.validate):
+                raise
+            # Read again from the start by the stdlib, which has no limit of depth
+            self._default_metadata(self.METADATA)
+            self.objects, self.units, self.ast = {}, [], None
+            self._decode_stream(units, get_backend('etree'))
+        self._merge()
+        self.timings['decode'] = time.perf_counter() - start
+
+    def _decode_stream(self, units: List[Unit], backend: Backend):
+        # Definitions are decoded one by one, and the other children of the score (metadata, ast) as a whole
+        units = iter(units)
+        for element, parent, depth in _iter_closed(self.file_path, backend, self.validate):
+            if depth == 2 and parent.tag in DEFINITION_BLOCKS:
+                assert element.attrib.get('id') is not None
+                unit = next(units)
+                self.units.append(unit._replace(records=_records(unit.key, element)))
+                self.objects[element.attrib['id']] = self.decode(element)
+                parent.remove(element)
+            elif depth == 1:
+                if element.tag not in DEFINITION_BLOCKS:
+                    unit = next(units)
+                    self.units.append(unit._replace(records=_records(unit.key, element)))
+                self.decode(element)
+                parent.remove(element)
+
+    @staticmethod
+    def _elements(root: ET.Element):
+        # Key, block and element of the units, in document order
+        for child in root:
+            if child.tag in DEFINITION_BLOCKS:
+                for definition in child:
+                    yield definition.attrib['id'], child.tag, definition
+            else:
+                yield AST if child.tag == 'ast' else None, None, child
+
+    def _merge(self):
+        # Dependency graph of the units; an id defined several times holds all its definitions
+        self.dependencies, self.digests = {}, {}
+        for unit in self.units:
+            for name, references, digest in unit.records:
+                self.dependencies.setdefault(name, set()).update(references)
+                self.digests[name] = self.digests.get(name, '') + digest
+
+    def update(self, file_path: Path) -> Set[str]:
+        """
+        Recompile the score from a new version of its file, decoding again only the definitions whose content
+        changed and those depending on them through the dependency graph.
+
+        Only the bytes between the units left unchanged at the beginning and at the end of the file are scanned, and
+        only the units whose bytes changed are parsed and digested, each one on its own. The first update of a score
+        compiled from a tree scans, parses and digests all the units, as their bytes are not known yet.
+
+        Returns the ids of the decoded definitions (``AST`` for the ast). Unchanged definitions nested in a decoded one
+        keep their object. The metadata are decoded again when they changed, or take their default value again when
+        removed, and a change of timebase recompiles the whole score.
+        """
+        if self.validate:
+            # The schema applies to the whole document
+            self.backend.parse(file_path, self.validate)
+
+        with _mapped(file_path) as data:
+            try:
+                units = self._rescan(data)
+            except expat.ExpatError as error:
+                self._parse_error(file_path, error)
+            resolution = lcm(1, *(unit.resolution for unit in units))
+            if resolution != self.resolution:
+                self.__dict__.update(ScoreTree(file_path, backend=self.backend, validate=self.validate).__dict__)
+                return set(self.digests)
+
+            # Units are matched with the previous ones by the digest of their bytes
+            previous = {}
+            for index, unit in enumerate(self.units):
+                previous.setdefault((unit.key, unit.block, unit.source), index)
+            old_elements = None
+            if self.root is not None:
+                old_elements = [element for _, _, element in self._elements(self.root)]
+            declaration = _declaration(data)
+            elements, changed = {}, set()
+            for index, unit in enumerate(units):
+                match = previous.get((unit.key, unit.block, unit.source))
+                if match is None:
+                    elements[index] = self._parse_unit(data, unit, declaration)
+                    units[index] = unit._replace(records=_records(unit.key, elements[index]))
+                    changed.add(index)
+                else:
+                    if old_elements is not None:
+                        elements[index] = old_elements[match]
+                    units[index] = unit._replace(records=self.units[match].records)
+
+            old_digests = self.digests
+            self.units = units
+            self._merge()
+
+            # Changed and removed definitions, and everything referencing them
+            stale = {name for name in self.digests if old_digests.get(name) != self.digests[name]}
+            removed = old_digests.keys() - self.digests.keys()
+            dependents = {}
+            for name, references in self.dependencies.items():
+                for reference in references:
+                    dependents.setdefault(reference, set()).add(name)
+            pending = list(stale | removed)
+            while pending:
+                for name in dependents.get(pending.pop(), ()):
+                    if name not in stale:
+                        stale.add(name)
+                        pending.append(name)
+
+            for name in removed:
+                self.objects.pop(name, None)
+            if AST in removed:
+                self.ast = None
+
+            # Metadata removed from the file take their default value again
+            self._default_metadata(set(self.METADATA) - {unit.tag for unit in units})
+
+            # Definitions come before their uses in the file; unchanged units are parsed only if they must be decoded
+            for index, unit in enumerate(units):
+                if unit.key in stale or unit.key is None and index in changed:
+                    if index not in elements:
+                        elements[index] = self._parse_unit(data, unit, declaration)
+                    self.decode(elements[index], stale)
+
+        self.file_path = file_path
+        if self.root is not None and any(type(element) is not type(self.root) for element in elements.values()):
+            # Elements of lxml and of the stdlib, which lxml falls back on for deep documents, do not mix in a tree
+            self.tree = self.backend.parse(file_path)
+            self.root = self.tree.getroot()
+        elif self.root is not None:
+            self._splice(elements)
+        return stale
+
+    def _rescan(self, data) -> List[Unit]:
+        # Units of a new version of the file. The units whose covered bytes are found unchanged from the beginning
+        # and, shifted, from the end of the file are kept, and only the bytes between them are scanned again
+        old = self.units
+        if len(old) == 0 or old[0].source is None:
+            # Units decoded from a tree were never scanned
+            return _scan(data)[0]
+        begins = [0] + [unit.end for unit in old[:-1]]
+
+        def unchanged(index, shift=0):
+            begin, end = begins[index] + shift, old[index].end + shift
+            return begin >= 0 and end <= len(data) and _source(memoryview(data)[begin:end]) == old[index].source
+
+        def path(index):
+            # Tags open where the unit starts to cover the file
+            if index == 0:
+                return []
+            return ['score'] + ([old[index].block] if old[index].block is not None else [])
+
+        head = 0
+        while head < len(old) and unchanged(head):
+            head += 1
+        if head == len(old):
+            return list(old) if len(data) == old[-1].end else _scan(data)[0]
+
+        shift = len(data) - old[-1].end
+        tail = len(old)
+        while tail > max(head, 1) and begins[tail - 1] + shift >= begins[head] and unchanged(tail - 1, shift):
+            tail -= 1
+
+        end = begins[tail] + shift if tail < len(old) else len(data)
+        try:
+            middle, tags = _scan(data, begins[head], end, tuple(path(head)))
+        except expat.ExpatError:
+            return _scan(data)[0]
+        if tail < len(old) and tags != path(tail):
+            # The changed bytes open or close elements around the units, e.g. a block
+            return _scan(data)[0]
+        return old[:head] + middle + [unit._replace(start=unit.start + shift, stop=unit.stop + shift,
+                                                    end=unit.end + shift) for unit in old[tail:]]
+
+    def _parse_error(self, file_path: Path, error: expat.ExpatError):
+        # A file the scan cannot read is reported with the error of the backend, as by a compilation
+        self.backend.parse(file_path)
+        raise error
+
+    def _parse_unit(self, data, unit: Unit, declaration: bytes) -> ET.Element:
+        return self.backend.fromstring(declaration + bytes(data[unit.start:unit.stop]))
+
+    def _splice(self, elements: Dict[int, ET.Element]):
+        # Tree of the new file, made of the elements of the previous tree for the unchanged units
+        blocks = {child.tag: child for child in self.root if child.tag in DEFINITION_BLOCKS}
+        children, definitions = [], {}
+        for index, unit in enumerate(self.units):
+            if unit.block is None:
+                children.append(elements[index])
+                continue
+            if unit.block not in definitions:
+                if unit.block not in blocks:
+                    blocks[unit.block] = self.backend.fromstring(f'<{unit.block}/>'.encode())
+                children.append(blocks[unit.block])
+                definitions[unit.block] = []
+            definitions[unit.block].append(elements[index])
+        for tag, block in definitions.items():
+            blocks[tag][:] = block
+        self.root[:] = children
 
     class Tempo:
         def __init__(self, beat: frac, bpm: int):
@@ -46,265 +493,173 @@ class ScoreTree:
         def __repr__(self):
             return f'{self.numerator}/{self.denominator}'
 
-    def to_midi(self, velocity: int = 50):
-        import pretty_midi
+    def to_midi(self, velocity: int = 50, notes=None):
+        from .midi import to_midi
+
+        if notes is None:
+            notes = self.ast.to_note_array()
 
         bpm = self.tempo.bpm * self.tempo.beat / frac(1, 4)
 
         start = -self.anacrusis
 
-        midi = pretty_midi.PrettyMIDI()
+        return to_midi(notes, velocity, bpm, start)
+
+    def decode(self, element: ET.Element, stale: Optional[Set[str]] = None):
+        """
+        Object of an element, decoded after its children on an explicit stack, so that the depth of the XML is not
+        limited by the recursion limit.
+
+        Each tag has a handler in ``HANDLERS``, which receives the element and the objects of the children it asks
+        for. References (a first child ``<id>``) and the registration of ``id`` attributes are shared by all tags.
+
+        Given the ``stale`` ids, nested definitions with another id keep their object instead of being decoded.
+        """
+        values = []
+        stack = [(element, False)]
+        while stack:
+            element, expanded = stack.pop()
+            try:
+                handler, children = self.HANDLERS[element.tag]
+            except KeyError:
+                raise NotImplementedError("Tag '%s' not implemented." % element.tag)
+
+            if expanded:
+                count = len(element[children])
+                arguments = values[len(values) - count:]
+                del values[len(values) - count:]
+            elif stale is not None and element.attrib.get('id') in self.objects \
+                    and element.attrib['id'] not in stale:
+                values.append(self.objects[element.attrib['id']])
+                continue
+            elif element.tag in REFERENCE_TAGS and len(element) != 0 and element[0].tag == 'id':
+                values.append(self.objects[element[0].text])
+                continue
+            elif children is not None and len(element[children]) != 0:
+                stack.append((element, True))
+                stack.extend((child, False) for child in reversed(element[children]))
+                continue
+            else:
+                arguments = []
 
-        notes = self.ast.notes()
+            value = handler(self, element, arguments)
+            if element.attrib.get('id') is not None:
+                self.objects[element.attrib['id']] = value
+            values.append(value)
 
-        # Get instruments
-        instruments = set()
-        for note in notes:
-            # print(note)
-            instruments.add(note.instrument)
+        return values[0]
 
-        # Add instruments
-        tracks = {}
-        for instrument in instruments:
-            instrument_program = pretty_midi.instrument_name_to_program(instrument.name)
-            track = pretty_midi.Instrument(program=instrument_program)
-            tracks[instrument] = track
+    # Handlers
+    def _decode_score(self, element, children):
+        pass
 
-        for note in notes:
-            instrument = note.instrument
-            onset_s = float((note.onset - start) * 240 / bpm)
-            duration_s = float(note.duration * 240 / bpm)
-            end_s = onset_s + duration_s
-            note = pretty_midi.Note(velocity=velocity, pitch=note.pitch.number, start=onset_s, end=end_s)
-            tracks[instrument].notes.append(note)
+    def _decode_title(self, element, children):
+        self.title = element.text
 
-        for track in tracks.values():
-            midi.instruments.append(track)
-        return midi
+    def _decode_composer(self, element, children):
+        self.composer = element.text
 
-    def decode(self, element: ET.Element):
-        # Root
-        if element.tag == 'score':
-            for child in element:
-                self.decode(child)
-        # Metadata
-        elif element.tag == 'title':
-            self.title = element.text
-        elif element.tag == 'composer':
-            self.composer = element.text
-        elif element.tag == 'tempo':
-            self.tempo = ScoreTree.Tempo(self.decode(element[0]), int(element[1].text))
-        elif element.tag == 'time-signature':
-            self.time_signature = ScoreTree.TimeSignature(int(element[0].text), int(element[1].text))
-        elif element.tag == 'anacrusis':
-            self.anacrusis = frac(int(element.attrib['num']), int(element.attrib['den']))
-        # Ids
-        elif element.tag in ['hits', 'rhythms', 'textures',
-                             'pitches', 'chords', 'harmonies',
-                             'instruments', 'sections', 'instrumentations']:
-            for child in element:
-                assert child.attrib.get('id') is not None
-                self.objects[child.attrib['id']] = self.decode(child)
-        elif element.tag == 'id':
-            return self.objects[element.text]
-        # Objects
-        elif element.tag in ['onset', 'duration', 'beat']:
-            return frac(int(element.attrib['num']), int(element.attrib['den']))
-        elif element.tag == 'hit':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode hit
-            start = self.decode(element[0])
-            duration = self.decode(element[1])
-            hit = Hit(start, duration)
-
-            # Save the hit if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = hit
-
-            return hit
-        elif element.tag == 'rhythm':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode rhythm
-            hits = set()
-            for child in element:
-                hit = self.decode(child)
-                hits.add(hit)
-            if len(hits) == 0:
-                rhythm = Rhythm()
-            else:
-                rhythm = Rhythm(hits)
+    def _decode_tempo(self, element, children):
+        self.tempo = ScoreTree.Tempo(children[0], int(element[1].text))
 
-            # Save the rhythm if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = rhythm
-
-            return rhythm
-        elif element.tag == 'texture':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode texture
-            rhythms = []
-            for child in element:
-                rhythm = self.decode(child)
-                rhythms.append(rhythm)
-            texture = Texture(*rhythms)
-
-            # Save the texture if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = texture
+    def _decode_time_signature(self, element, children):
+        self.time_signature = ScoreTree.TimeSignature(int(element[0].text), int(element[1].text))
 
-            return texture
-        elif element.tag == 'number':
-            return int(element.text)
-        elif element.tag == 'pitch':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
+    def _decode_anacrusis(self, element, children):
+        self.anacrusis = frac(int(element.attrib['num']), int(element.attrib['den']))
 
-            # Decode pitch
-            number = self.decode(element[0])
-            pitch = Pitch(number)
+    def _decode_definitions(self, element, children):
+        # The definitions are registered by their id attribute
+        assert all(child.attrib.get('id') is not None for child in element)
 
-            # Save the pitch if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = pitch
-
-            return pitch
-        elif element.tag == 'chord':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode chord
-            pitches = set()
-            for child in element:
-                pitch = self.decode(child)
-                pitches.add(pitch)
-            if len(pitches) == 0:
-                chord = Chord()
-            else:
-                chord = Chord(pitches)
+    def _decode_id(self, element, children):
+        return self.objects[element.text]
 
-            # Save the chord if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = chord
-
-            return chord
-        elif element.tag == 'harmony':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode harmony
-            chords = []
-            for child in element:
-                chord = self.decode(child)
-                chords.append(chord)
-            harmony = Harmony(*chords)
-
-            # Save the harmony if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = harmony
-
-            return harmony
-        elif element.tag == 'instrument':
-            return Instrument(element[0].text)
-        elif element.tag == 'section':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode section
-            instruments = set()
-            for child in element:
-                instrument = self.decode(child)
-                instruments.add(instrument)
-            section = Section(instruments)
-
-            # Save the section if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = section
-
-            return section
-        elif element.tag == 'instrumentation':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode instrumentation
-            sections = []
-            for child in element:
-                section = self.decode(child)
-                sections.append(section)
-            instrumentation = Instrumentation(sections)
-
-            # Save the instrumentation if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = instrumentation
+    def _decode_time(self, element, children):
+        return frac(int(element.attrib['num']), int(element.attrib['den']))
 
-            return instrumentation
-        # Operators
-        elif element.tag == 'product':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
-
-            # Decode product
-            texture = self.decode(element[0])
-            harmony = self.decode(element[1])
-            if len(element) == 3:
-                instrumentation = self.decode(element[2])
-            else:
-                instrumentation = Instrumentation(
-                    [Section({Instrument('Acoustic Grand Piano')}) for _ in range(len(texture))])
-            tensor_contraction = TensorContraction(harmony, texture, instrumentation)
+    def _decode_hit(self, element, children):
+        return Hit._make(children[0], children[1])
 
-            # Save the harmonic texture if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = tensor_contraction
+    def _decode_rhythm(self, element, children):
+        return Rhythm._make(set(children), self.resolution).freeze()
 
-            return tensor_contraction
-        elif element.tag == 'parallel':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
+    def _decode_texture(self, element, children):
+        return Texture._make(children)
 
-            # Decode parallel
-            tensor_contraction = TensorContraction()
-            for child in element:
-                tensor_contraction = tensor_contraction | self.decode(child)
+    def _decode_number(self, element, children):
+        return int(element.text)
 
-            # Save the harmonic texture if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = tensor_contraction
+    def _decode_pitch(self, element, children):
+        return Pitch._make(children[0])
 
-            return tensor_contraction
-        elif element.tag == 'concatenate':
-            # Check if it's a reference
-            if len(element) != 0 and element[0].tag == 'id':
-                return self.decode(element[0])
+    def _decode_chord(self, element, children):
+        return Chord._make(set(children)).freeze()
 
-            # Decode concatenate
-            tensor_contraction = TensorContraction()
-            for child in element:
-                tensor_contraction = tensor_contraction - self.decode(child)
+    def _decode_harmony(self, element, children):
+        return Harmony._make(children)
 
-            # Save the harmonic texture if it has an id
-            if element.attrib.get('id') is not None:
-                self.objects[element.attrib['id']] = tensor_contraction
+    def _decode_instrument(self, element, children):
+        return Instrument(element[0].text)
+
+    def _decode_section(self, element, children):
+        return Section._make(set(children))
+
+    def _decode_instrumentation(self, element, children):
+        return Instrumentation._make(children)
 
-            return tensor_contraction
-        elif element.tag == 'ast':
-            ast = self.decode(element[0])
-            self.ast = ast
-        # Not implemented
+    def _decode_product(self, element, children):
+        texture, harmony = children[0], children[1]
+        if len(children) == 3:
+            instrumentation = children[2]
         else:
-            raise NotImplementedError("Tag '%s' not implemented." % element.tag)
+            instrumentation = Instrumentation._make(
+                [Section._make({Instrument('Acoustic Grand Piano')}) for _ in range(len(texture))])
+        return TensorContraction(harmony, texture, instrumentation)
+
+    def _decode_parallel(self, element, children):
+        if len(children) == 0:
+            return TensorContraction()
+        return parallelization(*children)
+
+    def _decode_concatenate(self, element, children):
+        if len(children) == 0:
+            return TensorContraction()
+        return concatenation(*children)
+
+    def _decode_ast(self, element, children):
+        self.ast = children[0]
+
+    # Handler of each tag, and the children decoded before it is called (None for none of them)
+    HANDLERS = {
+        # Root
+        'score': (_decode_score, slice(None)),
+        # Metadata
+        'title': (_decode_title, None),
+        'composer': (_decode_composer, None),
+        'tempo': (_decode_tempo, slice(0, 1)),
+        'time-signature': (_decode_time_signature, None),
+        'anacrusis': (_decode_anacrusis, None),
+        # Ids
+        **dict.fromkeys(DEFINITION_BLOCKS, (_decode_definitions, slice(None))),
+        'id': (_decode_id, None),
+        # Objects
+        'onset': (_decode_time, None),
+        'duration': (_decode_time, None),
+        'beat': (_decode_time, None),
+        'hit': (_decode_hit, slice(None)),
+        'rhythm': (_decode_rhythm, slice(None)),
+        'texture': (_decode_texture, slice(None)),
+        'number': (_decode_number, None),
+        'pitch': (_decode_pitch, slice(None)),
+        'chord': (_decode_chord, slice(None)),
+        'harmony': (_decode_harmony, slice(None)),
+        'instrument': (_decode_instrument, None),
+        'section': (_decode_section, slice(None)),
+        'instrumentation': (_decode_instrumentation, slice(None)),
+        # Operators
+        'product': (_decode_product, slice(None)),
+        'parallel': (_decode_parallel, slice(None)),
+        'concatenate': (_decode_concatenate, slice(None)),
+        'ast': (_decode_ast, slice(0, 1)),
+    }
@@ -0,0 +1,107 @@
+from math import gcd
+from weakref import WeakValueDictionary
+from .model import Rhythm, Texture, Chord, Harmony
+
+
+def _intern(cls, key, **attributes):
+    try:
+        return cls._table[key]
+    except KeyError:
+        pass
+
+    frozen = object.__new__(cls)
+    for name, value in attributes.items():
+        object.__setattr__(frozen, name, value)
+    object.__setattr__(frozen, '_hash', hash(key))
+    cls._table[key] = frozen
+    return frozen
+
+
+class _Frozen:
+    """
+    Immutable and hash-consed: a single instance is alive per distinct content, so equality between frozen
+    objects is an identity check and their hash is computed once.
+    """
+    _table: WeakValueDictionary
+
+    def __init__(self, *args):
+        # The content is set by __new__
+        pass
+
+    def __setattr__(self, name, value):
+        # Private attributes are caches filled on first access
+        if not name.startswith('_'):
+            raise AttributeError(f"{type(self).__name__} is immutable.")
+        object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self is other
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return self._hash
+
+    def freeze(self):
+        return self
+
+
+class FrozenRhythm(_Frozen, Rhythm):
+    _table = WeakValueDictionary()
+
+    def __new__(cls, rhythm: Rhythm):
+        if isinstance(rhythm, FrozenRhythm):
+            return rhythm
+
+        # The key is on the coarsest grid of the hits, so that equal rhythms on different grids share it
+        resolution = rhythm.resolution
+        ticks = frozenset(rhythm.ticks())
+        divisor = gcd(resolution, *(t for hit in ticks for t in hit))
+        key = (resolution // divisor, frozenset((o // divisor, d // divisor) for o, d in ticks))
+        return _intern(cls, key, _resolution=resolution, _ticks=ticks)
+
+    def __reduce__(self):
+        return FrozenRhythm, (Rhythm._from_ticks(set(self._ticks), self._resolution),)
+
+
+class FrozenChord(_Frozen, Chord):
+    _table = WeakValueDictionary()
+
+    def __new__(cls, chord: Chord):
+        if isinstance(chord, FrozenChord):
+            return chord
+
+        # Same key as the hash of Chord, so that equal frozen and plain chords hash alike
+        key = chord._mask, chord._escape
+        return _intern(cls, key, _mask=chord._mask, _escape=chord._escape)
+
+    def __reduce__(self):
+        return FrozenChord, (Chord._from_mask(self._mask, self._escape),)
+
+
+class FrozenTexture(_Frozen, Texture):
+    _table = WeakValueDictionary()
+
+    def __new__(cls, texture: Texture):
+        if isinstance(texture, FrozenTexture):
+            return texture
+
+        rhythms = tuple(FrozenRhythm(r) for r in texture.rhythms)
+        return _intern(cls, rhythms, rhythms=rhythms)
+
+    def __reduce__(self):
+        return FrozenTexture, (Texture._make(list(self.rhythms)),)
+
+
+class FrozenHarmony(_Frozen, Harmony):
+    _table = WeakValueDictionary()
+
+    def __new__(cls, harmony: Harmony):
+        if isinstance(harmony, FrozenHarmony):
+            return harmony
+
+        chords = tuple(FrozenChord(c) for c in harmony.chords)
+        return _intern(cls, chords, chords=chords)
+
+    def __reduce__(self):
+        return FrozenHarmony, (Harmony._make(list(self.chords)),)
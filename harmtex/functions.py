@@ -1,9 +1,16 @@
-from .model import TensorContraction
+from .model import TensorContraction, Expression, Parallel, Concatenate
 
 
 def parallelization(*args):
     if len(args) == 0:
         raise ValueError('At least one argument is required')
+    if len(args) == 1:
+        return args[0]
+
+    if any(isinstance(arg, Expression) for arg in args):
+        return Parallel(*(arg if isinstance(arg, Expression) else arg.lazy() for arg in args))
+    if all(isinstance(arg, TensorContraction) for arg in args):
+        return TensorContraction.parallelize(*args)
 
     result = args[0]
     for arg in args[1:]:
@@ -14,6 +21,13 @@ def parallelization(*args):
 def concatenation(*args: TensorContraction) -> TensorContraction:
     if len(args) == 0:
         raise ValueError('At least one argument is required')
+    if len(args) == 1:
+        return args[0]
+
+    if any(isinstance(arg, Expression) for arg in args):
+        return Concatenate(*(arg if isinstance(arg, Expression) else arg.lazy() for arg in args))
+    if all(isinstance(arg, TensorContraction) for arg in args):
+        return TensorContraction.concatenate(*args)
 
     result = args[0]
     for arg in args[1:]:
@@ -1,19 +1,79 @@
-def to_midi(notes, velocity=64, bpm=100):
+from collections.abc import Iterator
+from math import lcm
+from .model import frac
+
+
+def to_midi(notes, velocity=64, bpm=100, start=None):
+    """
+    MIDI file of a note array or of a collection of notes.
+
+    Iterators (e.g. ``TensorContraction.iter_notes()``) are consumed one note at a time. Unless ``start`` is
+    given, their first note must be the earliest one.
+    """
     import pretty_midi
-    notes = notes
-    start = min(note.onset for note in notes)
+    from .array import NoteArray
+
+    if isinstance(notes, Iterator):
+        return _stream_to_midi(notes, velocity, bpm, start)
+
+    if not isinstance(notes, NoteArray):
+        notes = NoteArray.from_notes(notes)
+
     midi = pretty_midi.PrettyMIDI()
+    if len(notes) == 0:
+        return midi
+
+    bpm = frac(bpm)
+
+    if start is None:
+        start_ticks = int(notes.onset.min())
+    else:
+        start = frac(start)
+        notes = notes.rescale(lcm(notes.resolution, start.denominator))
+        start_ticks = start.numerator * (notes.resolution // start.denominator)
 
-    instruments = set(note.instrument for note in notes)
-    for instrument in instruments:
+    # Seconds per tick as an exact ratio, so that each time is rounded to float only once
+    numerator = 240 * bpm.denominator
+    denominator = notes.resolution * bpm.numerator
+    onsets_s = ((notes.onset - start_ticks) * numerator / denominator).tolist()
+    durations_s = (notes.duration * numerator / denominator).tolist()
+
+    tracks = []
+    for instrument in notes.instruments:
         instrument_program = pretty_midi.instrument_name_to_program(instrument.name)
-        track = pretty_midi.Instrument(program=instrument_program)
-        notes_instrument = [note for note in notes if note.instrument == instrument]
-        for note in notes_instrument:
-            onset_s = float((note.onset - start) * 240 / bpm)
-            duration_s = float(note.duration * 240 / bpm)
-            end_s = onset_s + duration_s
-            note = pretty_midi.Note(velocity=velocity, pitch=note.pitch.number, start=onset_s, end=end_s)
-            track.notes.append(note)
-        midi.instruments.append(track)
+        tracks.append(pretty_midi.Instrument(program=instrument_program))
+
+    for pitch, code, onset_s, duration_s in zip(notes.pitch.tolist(), notes.instrument.tolist(),
+                                                onsets_s, durations_s):
+        end_s = onset_s + duration_s
+        note = pretty_midi.Note(velocity=velocity, pitch=pitch, start=onset_s, end=end_s)
+        tracks[code].notes.append(note)
+
+    for track in tracks:
+        if len(track.notes) != 0:
+            midi.instruments.append(track)
+    return midi
+
+
+def _stream_to_midi(notes, velocity, bpm, start):
+    import pretty_midi
+
+    midi = pretty_midi.PrettyMIDI()
+    seconds_per_whole = 240 / frac(bpm)
+
+    tracks = {}
+    for note in notes:
+        if start is None:
+            start = note.onset
+
+        onset_s = float((note.onset - start) * seconds_per_whole)
+        end_s = onset_s + float(note.duration * seconds_per_whole)
+
+        try:
+            track = tracks[note.instrument]
+        except KeyError:
+            instrument_program = pretty_midi.instrument_name_to_program(note.instrument.name)
+            track = tracks[note.instrument] = pretty_midi.Instrument(program=instrument_program)
+            midi.instruments.append(track)
+        track.notes.append(pretty_midi.Note(velocity=velocity, pitch=note.pitch.number, start=onset_s, end=end_s))
     return midi
@@ -1,12 +1,40 @@
 import warnings
 from fractions import Fraction as frac
-from typing import Set, List, Tuple, Union, Optional
+from functools import lru_cache
+from math import gcd, lcm
+from typing import Dict, FrozenSet, Hashable, Iterator, Set, List, Tuple, Union, Optional
 from multimethod import multimethod
 from .constants import ROMAN_NUMERAL_TO_SHIFT, ROMAN_NUMERAL_TO_FACTORS
+from .timebase import resolution_of, to_ticks, to_times
+from .utils import cache_dispatch
+
+
+# Extents
+def _union(a: Optional[Tuple[frac, frac]], b: Optional[Tuple[frac, frac]]) -> Optional[Tuple[frac, frac]]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1])
+
+
+def _shift(extent: Optional[Tuple[frac, frac]], shift: frac) -> Optional[Tuple[frac, frac]]:
+    if extent is None:
+        return None
+    return extent[0] + shift, extent[1] + shift
+
+
+def _scale(extent: Optional[Tuple[frac, frac]], ratio: frac) -> Optional[Tuple[frac, frac]]:
+    if extent is None:
+        return None
+    return extent[0] * ratio, extent[1] * ratio
 
 
 # Time
+@cache_dispatch
 class Hit:
+    __slots__ = ('onset', 'duration')
+
     @multimethod
     def __init__(self, hit: 'Hit'):
         self.onset = hit.onset
@@ -26,8 +54,16 @@ class Hit:
     def __init__(self, onset_duration: Tuple[frac, frac]):
         self.onset, self.duration = onset_duration
 
+    @classmethod
+    def _make(cls, onset: frac, duration: frac) -> 'Hit':
+        # Internal constructors skip the dispatch of __init__ and take their arguments already in canonical form
+        hit = object.__new__(cls)
+        hit.onset = onset
+        hit.duration = duration
+        return hit
+
     def __radd__(self, other: frac) -> 'Hit':
-        return Hit(self.onset + other, self.duration)
+        return Hit._make(self.onset + other, self.duration)
 
     def __hash__(self):
         return hash((self.onset, self.duration))
@@ -41,6 +77,7 @@ class Hit:
         return f"({self.onset}, {self.duration})"
 
 
+@cache_dispatch
 class Rhythm:
     @multimethod
     def __init__(self):
@@ -66,21 +103,138 @@ class Rhythm:
     def __init__(self, *hits: Tuple[frac, frac]):
         self.hits = {Hit(h) for h in hits}
 
+    @classmethod
+    def _make(cls, hits: Set[Hit], resolution: Optional[int] = None) -> 'Rhythm':
+        rhythm = object.__new__(cls)
+        rhythm.hits = hits
+        if resolution is not None:
+            rhythm._resolution = resolution
+            rhythm._ticks = {(to_ticks(h.onset, resolution), to_ticks(h.duration, resolution)) for h in hits}
+        return rhythm
+
+    @classmethod
+    def _from_ticks(cls, ticks: Set[Tuple[int, int]], resolution: int) -> 'Rhythm':
+        rhythm = object.__new__(cls)
+        rhythm._resolution = resolution
+        rhythm._ticks = ticks
+        return rhythm
+
     def __add__(self, shift: frac) -> 'Rhythm':
-        return Rhythm({shift + Hit(hit.onset, hit.duration) for hit in self.hits})
+        # The grid only gets finer when the shift does not fall on it
+        resolution = lcm(self.resolution, shift.denominator)
+        step = shift.numerator * (resolution // shift.denominator)
+        result = Rhythm._from_ticks({(o + step, d) for o, d in self.ticks(resolution)}, resolution)
+        result._extent = _shift(self.extent, shift)
+        shape, start = self.shape
+        result._shape = shape, start * (resolution // self.resolution) + step
+        return result
 
     def __mul__(self, ratio: Union[int, frac]) -> 'Rhythm':
-        return Rhythm({Hit(hit.onset * ratio, hit.duration * ratio) for hit in self.hits})
+        factor = ratio.numerator
+        result = Rhythm._from_ticks({(o * factor, d * factor) for o, d in self.ticks()},
+                                    self.resolution * ratio.denominator)
+        if ratio >= 0:
+            result._extent = _scale(self.extent, ratio)
+        return result
 
     def __eq__(self, other):
         if not isinstance(other, Rhythm):
             return False
-        return self.hits == other.hits
+        resolution = lcm(self.resolution, other.resolution)
+        return self.ticks(resolution) == other.ticks(resolution)
 
     def __repr__(self):
         return '{' + f"{', '.join([str(h) for h in self.hits])}" + '}'
 
+    def freeze(self) -> 'FrozenRhythm':
+        from .frozen import FrozenRhythm
+        return FrozenRhythm(self)
+
+    @property
+    def hits(self) -> FrozenSet[Hit]:
+        # Rhythms computed by the operators only hold ticks until their hits are asked for. The hits are read-only, so
+        # that a change goes through the setter, which drops the caches
+        try:
+            return self._hits
+        except AttributeError:
+            pass
+
+        times = to_times((t for hit in self._ticks for t in hit), self._resolution)
+        self._hits = frozenset(Hit._make(times[o], times[d]) for o, d in self._ticks)
+        return self._hits
+
+    @hits.setter
+    def hits(self, hits: Set[Hit]):
+        for cache in ('_ticks', '_resolution', '_extent', '_shape'):
+            self.__dict__.pop(cache, None)
+        self._hits = frozenset(hits)
+
+    @property
+    def resolution(self) -> int:
+        try:
+            return self._resolution
+        except AttributeError:
+            pass
+
+        self._resolution = resolution_of(t for hit in self._hits for t in (hit.onset, hit.duration))
+        return self._resolution
+
+    def ticks(self, resolution: Optional[int] = None) -> Set[Tuple[int, int]]:
+        """
+        Onsets and durations of the hits in ticks, on a grid of ``resolution`` ticks per whole note.
+
+        The resolution defaults to the one of the rhythm and must be a multiple of it.
+        """
+        own = self.resolution
+        try:
+            ticks = self._ticks
+        except AttributeError:
+            ticks = self._ticks = {(to_ticks(h.onset, own), to_ticks(h.duration, own)) for h in self._hits}
+
+        if resolution is None or resolution == own:
+            return ticks
+        if resolution % own != 0:
+            raise ValueError(f"Resolution {resolution} is not a multiple of {own}.")
+        factor = resolution // own
+        return {(o * factor, d * factor) for o, d in ticks}
+
+    @property
+    def shape(self) -> Tuple[Hashable, int]:
+        """
+        Hits relative to the earliest onset on their coarsest grid, and the earliest onset in ticks.
+
+        Rhythms equal up to a shift have the same shape, which is kept by the shifts.
+        """
+        try:
+            return self._shape
+        except AttributeError:
+            pass
+
+        ticks = self.ticks()
+        start = min((o for o, _ in ticks), default=0)
+        divisor = gcd(self.resolution, *(o - start for o, _ in ticks), *(d for _, d in ticks))
+        hits = frozenset(((o - start) // divisor, d // divisor) for o, d in ticks)
+        self._shape = (self.resolution // divisor, hits), start
+        return self._shape
+
+    @property
+    def extent(self) -> Optional[Tuple[frac, frac]]:
+        # Earliest onset and latest end
+        try:
+            return self._extent
+        except AttributeError:
+            pass
+
+        ticks = self.ticks()
+        if len(ticks) == 0:
+            self._extent = None
+        else:
+            self._extent = (frac(min(o for o, _ in ticks), self.resolution),
+                            frac(max(o + d for o, d in ticks), self.resolution))
+        return self._extent
 
+
+@cache_dispatch
 class Texture:
     @multimethod
     def __init__(self):
@@ -98,6 +252,12 @@ class Texture:
     def __init__(self, rhythms: List[Rhythm]):
         self.rhythms = rhythms
 
+    @classmethod
+    def _make(cls, rhythms: List[Rhythm]) -> 'Texture':
+        texture = object.__new__(cls)
+        texture.rhythms = rhythms
+        return texture
+
     @multimethod
     def __mul__(self, harmony: 'Harmony') -> 'HarmonicTexture':
         return HarmonicTexture(harmony, self)
@@ -108,23 +268,33 @@ class Texture:
 
     @multimethod
     def __mul__(self, ratio: Union[frac, int]) -> 'Texture':
-        return Texture([r * ratio for r in self.rhythms])
+        result = Texture._make([r * ratio for r in self.rhythms])
+        if ratio >= 0:
+            result._extent = _scale(self.extent, ratio)
+        return result
 
     @multimethod
     def __add__(self, other: 'Texture') -> 'Texture':
-        return Texture(self.rhythms + other.rhythms)
+        result = Texture._make([*self.rhythms, *other.rhythms])
+        result._extent = _union(self.extent, other.extent)
+        return result
 
     @multimethod
     def __add__(self, other: Union[frac, int]) -> 'Texture':
-        return Texture([r + other for r in self.rhythms])
+        result = Texture._make([r + other for r in self.rhythms])
+        result._extent = _shift(self.extent, other)
+        return result
 
     def __sub__(self, other: 'Texture') -> 'Texture':
-        return Texture(self.rhythms + [r + self.endpoint for r in other.rhythms])
+        endpoint = self.endpoint
+        result = Texture._make([*self.rhythms, *(r + endpoint for r in other.rhythms)])
+        result._extent = _union(self.extent, _shift(other.extent, endpoint))
+        return result
 
     def __eq__(self, other):
         if not isinstance(other, Texture):
             return False
-        return self.rhythms == other.rhythms
+        return list(self.rhythms) == list(other.rhythms)
 
     def __len__(self):
         return len(self.rhythms)
@@ -132,22 +302,87 @@ class Texture:
     def __repr__(self):
         return f"[{', '.join([str(r) for r in self.rhythms])}]"
 
+    def hit_counts(self) -> List[int]:
+        return [len(r.ticks()) for r in self.rhythms]
+
+    def freeze(self) -> 'FrozenTexture':
+        from .frozen import FrozenTexture
+        return FrozenTexture(self)
+
+    @classmethod
+    def concatenate(cls, *textures: 'Texture') -> 'Texture':
+        # Equivalent to folding with -, in a single pass: each texture is shifted by the sum of the previous endpoints
+        rhythms = []
+        extent = None
+        offset = frac(0)
+        for texture in textures:
+            if offset == 0:
+                rhythms.extend(texture.rhythms)
+            else:
+                rhythms.extend(r + offset for r in texture.rhythms)
+            extent = _union(extent, _shift(texture.extent, offset))
+            offset += texture.endpoint
+
+        result = cls._make(rhythms)
+        result._extent = extent
+        return result
+
+    @classmethod
+    def parallelize(cls, *textures: 'Texture') -> 'Texture':
+        extent = None
+        for texture in textures:
+            extent = _union(extent, texture.extent)
+
+        result = cls._make([r for texture in textures for r in texture.rhythms])
+        result._extent = extent
+        return result
+
     def __getitem__(self, key):
-        return Texture(self.rhythms[key])
+        if not isinstance(key, slice):
+            return Texture._make([self.rhythms[key]])
+
+        result = Texture._make(list(self.rhythms[key]))
+        if len(result) == len(self):
+            result._extent = self.extent
+        return result
 
     @property
-    def endpoint(self) -> frac:
-        result = frac(0)
+    def extent(self) -> Optional[Tuple[frac, frac]]:
+        # Operators set the extent of their result from the extents of their operands; otherwise (e.g. slices) it
+        # is combined once from the cached extents of the rhythms
+        try:
+            return self._extent
+        except AttributeError:
+            pass
+
+        extent = None
         for rhythm in self.rhythms:
-            for hit in rhythm.hits:
-                end = hit.onset + hit.duration
-                if end > result:
-                    result = end
-        return result
+            extent = _union(extent, rhythm.extent)
+        self._extent = extent
+        return extent
+
+    @property
+    def endpoint(self) -> frac:
+        extent = self.extent
+        if extent is None:
+            return frac(0)
+        return max(frac(0), extent[1])
 
 
 # Frequency
+@cache_dispatch
 class Pitch:
+    # Pitches are immutable and interned: there is a single instance per number
+    __slots__ = ('number',)
+    _pool = {}
+
+    def __new__(cls, value):
+        if type(value) is int:
+            return cls._make(value)
+        if isinstance(value, Pitch):
+            return value
+        return object.__new__(cls)
+
     @multimethod
     def __init__(self, pitch: 'Pitch'):
         self.number = pitch.number
@@ -156,41 +391,53 @@ class Pitch:
     def __init__(self, number: int):
         self.number = number
 
+    @classmethod
+    def _make(cls, number: int) -> 'Pitch':
+        try:
+            return cls._pool[number]
+        except KeyError:
+            pitch = cls._pool[number] = object.__new__(cls)
+            pitch.number = number
+            return pitch
+
+    def __reduce__(self):
+        return Pitch, (self.number,)
+
     @multimethod
     def __add__(self, other: 'Pitch') -> 'Pitch':
-        return Pitch(self.number + other.number)
+        return Pitch._make(self.number + other.number)
 
     @multimethod
     def __add__(self, other: int) -> 'Pitch':
-        return Pitch(self.number + other)
+        return Pitch._make(self.number + other)
 
     @multimethod
     def __sub__(self, other: 'Pitch') -> 'Pitch':
-        return Pitch(self.number - other.number)
+        return Pitch._make(self.number - other.number)
 
     @multimethod
     def __sub__(self, other: int) -> 'Pitch':
-        return Pitch(self.number - other)
+        return Pitch._make(self.number - other)
 
     @multimethod
     def __add__(self, other: 'Chord') -> 'Chord':
-        if len(other.pitches) == 0:
-            return Chord()
-        return Chord({self + p for p in other.pitches})
+        return other + self.number
 
     @multimethod
     def __add__(self, other: 'Harmony') -> 'Harmony':
-        return Harmony([self + c for c in other.chords])
+        return Harmony._make([c + self.number for c in other.chords])
 
     @multimethod
     def __add__(self, other: 'TensorContraction') -> 'TensorContraction':
-        return TensorContraction(self + other.harmony,
-                                 other.texture,
-                                 other.instrumentation)
+        return other + self.number
 
     @multimethod
     def __add__(self, other: 'HarmonicTexture') -> 'HarmonicTexture':
-        return HarmonicTexture(self + other.harmony, other.texture)
+        return HarmonicTexture._make(other.harmony + self.number, other.texture)
+
+    @multimethod
+    def __add__(self, other: 'Expression') -> 'Expression':
+        return other + self.number
 
     def __lt__(self, other):
         return self.number < other.number
@@ -207,14 +454,90 @@ class Pitch:
         return str(self.number)
 
 
+# Pitches of the MIDI range are the bits of an integer, the others are kept in a set
+_MIDI_MASK = (1 << 128) - 1
+_NO_ESCAPE = frozenset()
+
+
+def _split(numbers) -> Tuple[int, frozenset]:
+    mask = 0
+    escape = []
+    for number in numbers:
+        if 0 <= number < 128:
+            mask |= 1 << number
+        else:
+            escape.append(number)
+    return mask, frozenset(escape) if escape else _NO_ESCAPE
+
+
+def _bits(mask: int) -> List[int]:
+    numbers = []
+    while mask:
+        low = mask & -mask
+        numbers.append(low.bit_length() - 1)
+        mask ^= low
+    return numbers
+
+
+# Roman numerals are expanded once per numeral and options, from the spacing of their factors
+@lru_cache(maxsize=None)
+def _roman_numeral_chord(roman_numeral: str, inversion: int = 0, n_notes: Optional[int] = None) -> Tuple[int, ...]:
+    # Pitches of Chord.from_roman_numeral at octave 0
+    try:
+        shifts = ROMAN_NUMERAL_TO_SHIFT[roman_numeral]
+    except KeyError:
+        raise ValueError(f"Roman numeral: {roman_numeral} not found.")
+
+    n = len(shifts)
+    shifts_spacing = [(shifts[(i + 1) % n] - shifts[i % n]) % 12 for i in range(len(shifts))]
+    if n_notes is None:
+        n_notes = n
+
+    if inversion != 0:
+        shifts = shifts[inversion:] + shifts[:inversion]
+        shifts_spacing = shifts_spacing[inversion:] + shifts_spacing[:inversion]
+
+    bass = shifts[0]
+    return tuple(bass + sum(shifts_spacing[:i]) for i in range(n_notes))
+
+
+@lru_cache(maxsize=None)
+def _roman_numeral_factors(roman_numeral: str, factors: Tuple[str, ...]) -> Tuple[int, ...]:
+    # Pitches of the chords of Harmony.from_roman_numeral at octave 0
+    roman_numeral_dict = ROMAN_NUMERAL_TO_FACTORS[roman_numeral]
+    shifts = list(roman_numeral_dict.values())
+    keys = list(roman_numeral_dict.keys())
+    root = roman_numeral_dict['1']
+    n = len(shifts)
+    shifts_spacing = [(shifts[(i + 1) % n] - shifts[i % n]) % 12 for i in range(len(shifts))]
+    pitches = []
+    cum_shift = 0
+    i = 0
+    for f, factor in enumerate(factors):
+        while factor != keys[i] and factor != '-':
+            cum_shift += shifts_spacing[i]
+            i = (i + 1) % n
+
+        pitches.append(root + cum_shift)
+
+        if f < len(factors) - 1 and factors[f + 1] == '-':
+            pass
+        else:
+            cum_shift += shifts_spacing[i]
+            i = (i + 1) % n
+
+    return tuple(pitches)
+
+
+@cache_dispatch
 class Chord:
     @multimethod
     def __init__(self):
-        self.pitches = set()
+        self._mask, self._escape = 0, _NO_ESCAPE
 
     @multimethod
     def __init__(self, chord: 'Chord'):
-        self.pitches = {p for p in chord.pitches}
+        self._mask, self._escape = chord._mask, chord._escape
 
     @multimethod
     def __init__(self, pitches: Set[Pitch]):
@@ -222,29 +545,122 @@ class Chord:
 
     @multimethod
     def __init__(self, *pitches: Pitch):
-        self.pitches = set(pitches)
+        self.pitches = pitches
 
     @multimethod
     def __init__(self, pitches: Set[int]):
-        self.pitches = {Pitch(p) for p in pitches}
+        self._mask, self._escape = _split(pitches)
+
+    @classmethod
+    def _make(cls, pitches: Set[Pitch]) -> 'Chord':
+        return cls._from_mask(*_split(p.number for p in pitches))
+
+    @classmethod
+    def _from_numbers(cls, numbers) -> 'Chord':
+        return cls._from_mask(*_split(numbers))
+
+    @classmethod
+    def _from_mask(cls, mask: int, escape: frozenset = _NO_ESCAPE) -> 'Chord':
+        chord = object.__new__(cls)
+        chord._mask = mask
+        chord._escape = escape
+        return chord
+
+    @property
+    def numbers(self) -> Tuple[int, ...]:
+        # Sorted pitch numbers, dropped with the other caches when the pitches are set
+        try:
+            return self._numbers
+        except AttributeError:
+            pass
+
+        numbers = _bits(self._mask)
+        if self._escape:
+            numbers = sorted([*numbers, *self._escape])
+        self._numbers = tuple(numbers)
+        return self._numbers
+
+    @property
+    def pitches(self) -> FrozenSet[Pitch]:
+        # Read-only view of the bitmask: a new chord is made by setting the pitches
+        try:
+            return self._pitches
+        except AttributeError:
+            pass
+
+        self._pitches = frozenset(Pitch._make(n) for n in self.numbers)
+        return self._pitches
+
+    @pitches.setter
+    def pitches(self, pitches: Set[Pitch]):
+        for cache in ('_numbers', '_pitches', '_shape'):
+            self.__dict__.pop(cache, None)
+        self._mask, self._escape = _split(p.number for p in pitches)
 
     def __add__(self, other: int) -> 'Chord':
-        return Chord({p + other for p in self.pitches})
+        if other >= 0:
+            mask = self._mask << other
+            inside = mask <= _MIDI_MASK
+        else:
+            mask = self._mask >> -other
+            inside = self._mask & ((1 << -other) - 1) == 0
+
+        if inside and not self._escape:
+            result = Chord._from_mask(mask)
+        else:
+            result = Chord._from_numbers([n + other for n in self.numbers])
+        shape, low = self.shape
+        result._shape = shape, low + other
+        return result
 
     def __or__(self, other: 'Chord') -> 'Chord':
-        return Chord(self.pitches | other.pitches)
+        if self._escape or other._escape:
+            return Chord._from_mask(self._mask | other._mask, self._escape | other._escape)
+        return Chord._from_mask(self._mask | other._mask)
+
+    def __and__(self, other: 'Chord') -> 'Chord':
+        if self._escape and other._escape:
+            return Chord._from_mask(self._mask & other._mask, self._escape & other._escape)
+        return Chord._from_mask(self._mask & other._mask)
 
     def __getitem__(self, key):
-        ordered_pitches = sorted(list(self.pitches))
-        return Chord({ordered_pitches[i] for i in key})
+        numbers = self.numbers
+        return Chord._from_numbers([numbers[i] for i in key])
 
     def __eq__(self, other):
         if not isinstance(other, Chord):
             return False
-        return self.pitches == other.pitches
+        return self._mask == other._mask and self._escape == other._escape
+
+    def __hash__(self):
+        return hash((self._mask, self._escape))
+
+    def __len__(self):
+        return self._mask.bit_count() + len(self._escape)
 
     def __repr__(self):
-        return '{' + f"{', '.join([str(p) for p in self.pitches])}" + '}'
+        return '{' + f"{', '.join([str(n) for n in self.numbers])}" + '}'
+
+    @property
+    def shape(self) -> Tuple[Hashable, int]:
+        """
+        Pitches relative to the lowest one, and the lowest pitch.
+
+        Chords equal up to a transposition have the same shape, which is kept by the transpositions.
+        """
+        try:
+            return self._shape
+        except AttributeError:
+            pass
+
+        numbers = self.numbers
+        low = numbers[0] if numbers else 0
+        self._shape = frozenset(n - low for n in numbers), low
+        return self._shape
+
+    def freeze(self) -> 'FrozenChord':
+        from .frozen import FrozenChord
+        return FrozenChord(self)
 
     @classmethod
     def from_roman_numeral(cls, roman_numeral: str,
@@ -252,24 +668,10 @@ class Chord:
                            octave: int = 0,
                            n_notes: Optional[int] = None
                            ) -> 'Chord':
-        try:
-            shifts = ROMAN_NUMERAL_TO_SHIFT[roman_numeral]
-        except KeyError:
-            raise ValueError(f"Roman numeral: {roman_numeral} not found.")
-
-        n = len(shifts)
-        shifts_spacing = [(shifts[(i + 1) % n] - shifts[i % n]) % 12 for i in range(len(shifts))]
-        if n_notes is None:
-            n_notes = n
-
-        if inversion != 0:
-            shifts = shifts[inversion:] + shifts[:inversion]
-            shifts_spacing = shifts_spacing[inversion:] + shifts_spacing[:inversion]
-
-        bass = shifts[0] + 12 * octave
-        return cls({bass + sum(shifts_spacing[:i]) for i in range(n_notes)})
+        return cls._from_numbers([p + 12 * octave for p in _roman_numeral_chord(roman_numeral, inversion, n_notes)])
 
 
+@cache_dispatch
 class Harmony:
     @multimethod
     def __init__(self):
@@ -295,13 +697,19 @@ class Harmony:
     def __init__(self, *chords: Union[Chord, Set[Pitch], Set[int]]):
         self.chords = [Chord(c) for c in chords]
 
+    @classmethod
+    def _make(cls, chords: List[Chord]) -> 'Harmony':
+        harmony = object.__new__(cls)
+        harmony.chords = chords
+        return harmony
+
     @multimethod
     def __add__(self, other: 'Harmony') -> 'Harmony':
-        return Harmony(self.chords + other.chords)
+        return Harmony._make([*self.chords, *other.chords])
 
     @multimethod
     def __add__(self, other: int) -> 'Harmony':
-        return Harmony(*[c + other for c in self.chords])
+        return Harmony._make([c + other for c in self.chords])
 
     @multimethod
     def __mul__(self, texture: Texture) -> 'HarmonicTexture':
@@ -314,10 +722,12 @@ class Harmony:
     def __eq__(self, other):
         if not isinstance(other, Harmony):
             return False
-        return self.chords == other.chords
+        return list(self.chords) == list(other.chords)
 
     def __getitem__(self, key):
-        return Harmony(self.chords[key])
+        if not isinstance(key, slice):
+            return Harmony._make([self.chords[key]])
+        return Harmony._make(list(self.chords[key]))
 
     def __len__(self):
         return len(self.chords)
@@ -325,53 +735,88 @@ class Harmony:
     def __repr__(self):
         return f"[{', '.join([str(c) for c in self.chords])}]"
 
+    def pitch_counts(self) -> List[int]:
+        return [len(c) for c in self.chords]
+
+    def pitch_range(self, voices: List[bool] = None) -> Optional[Tuple[int, int]]:
+        # Lowest and highest pitches of the chords, or of the chords selected by voices
+        numbers = [n for v, c in enumerate(self.chords) if voices is None or voices[v] for n in c.numbers]
+        if len(numbers) == 0:
+            return None
+        return min(numbers), max(numbers)
+
+    def freeze(self) -> 'FrozenHarmony':
+        from .frozen import FrozenHarmony
+        return FrozenHarmony(self)
+
     @classmethod
     def from_chord(cls, chord: Chord):
-        ordered_pitches = sorted(chord.pitches, key=lambda p: p.number)
-        return Harmony([Chord(c) for c in ordered_pitches])
+        return Harmony._make([Chord._from_numbers([n]) for n in chord.numbers])
 
     @classmethod
     def from_roman_numeral(cls, roman_numeral: str, factors: List[str], octave: int = 0):
-        roman_numeral_dict = ROMAN_NUMERAL_TO_FACTORS[roman_numeral]
-        shifts = list(roman_numeral_dict.values())
-        keys = list(roman_numeral_dict.keys())
-        root = roman_numeral_dict['1']
-        n = len(shifts)
-        shifts_spacing = [(shifts[(i + 1) % n] - shifts[i % n]) % 12 for i in range(len(shifts))]
-        chords = []
-        cum_shift = 0
-        i = 0
-        for f, factor in enumerate(factors):
-            while factor != keys[i] and factor != '-':
-                cum_shift += shifts_spacing[i]
-                i = (i + 1) % n
-
-            chord = Chord(Pitch(root + cum_shift + 12 * octave))
-            chords.append(chord)
-
-            if f < len(factors) - 1 and factors[f + 1] == '-':
-                pass
-            else:
-                cum_shift += shifts_spacing[i]
-                i = (i + 1) % n
+        pitches = _roman_numeral_factors(roman_numeral, tuple(factors))
+        return Harmony._make([Chord._from_numbers([p + 12 * octave]) for p in pitches])
+
+    @classmethod
+    def from_roman_numerals(cls, roman_numerals: List[str], inversions=0, octaves=0, n_notes=None) -> 'HarmonyArray':
+        """
+        Progression with a chord per Roman numeral, as ``Chord.from_roman_numeral``.
+
+        Inversions, octaves and numbers of notes are given per chord or once for all of them. The pitches of each
+        distinct numeral, inversion and number of notes are looked up once, and the progression is expanded from
+        them by indexing, into an array-backed harmony.
+        """
+        from .array import HarmonyArray
+        count = len(roman_numerals)
+        inversions = [inversions] * count if isinstance(inversions, int) else list(inversions)
+        n_notes = [n_notes] * count if n_notes is None or isinstance(n_notes, int) else list(n_notes)
+
+        table = {}
+        ids = [table.setdefault(key, len(table)) for key in zip(roman_numerals, inversions, n_notes)]
+        rows = [_roman_numeral_chord(*key) for key in table]
+        return HarmonyArray._from_rows(rows, ids, octaves)
 
-        return Harmony(chords)
+    @classmethod
+    def from_roman_numeral_factors(cls, roman_numerals: List[str], factors: List[List[str]],
+                                   octaves=0) -> 'HarmonyArray':
+        """
+        Concatenation of ``Harmony.from_roman_numeral`` for each numeral with its factors and octave, expanded like
+        ``from_roman_numerals``.
+        """
+        from .array import HarmonyArray
+        table = {}
+        ids = [table.setdefault(key, len(table)) for key in zip(roman_numerals, map(tuple, factors))]
+        rows = [_roman_numeral_factors(*key) for key in table]
+        return HarmonyArray._from_rows(rows, ids, octaves, split=True)
 
     def extend(self, n: int = 1):
-        return self + Harmony([Chord() for _ in range(n)])
+        return self + Harmony._make([Chord._from_mask(0) for _ in range(n)])
 
     def permute(self, permutation: List[int]):
         assert len(permutation) == len(self)
-        return Harmony([self.chords[i] for i in permutation])
+        return Harmony._make([self.chords[i] for i in permutation])
 
     def __reversed__(self):
-        return Harmony(list(reversed(self.chords)))
+        return Harmony._make(list(reversed(self.chords)))
 
 
 # Instruments
 class Instrument:
-    def __init__(self, name: str):
-        self.name = name
+    # Instruments are immutable and interned: there is a single instance per name
+    __slots__ = ('name',)
+    _pool = {}
+
+    def __new__(cls, name: str):
+        try:
+            return cls._pool[name]
+        except KeyError:
+            instrument = cls._pool[name] = object.__new__(cls)
+            instrument.name = name
+            return instrument
+
+    def __reduce__(self):
+        return Instrument, (self.name,)
 
     def __eq__(self, other):
         if not isinstance(other, Instrument):
@@ -385,6 +830,7 @@ class Instrument:
         return self.name
 
 
+@cache_dispatch
 class Section:
     @multimethod
     def __init__(self):
@@ -402,8 +848,14 @@ class Section:
     def __init__(self, *instruments: Instrument):
         self.instruments = set(instruments)
 
+    @classmethod
+    def _make(cls, instruments: Set[Instrument]) -> 'Section':
+        section = object.__new__(cls)
+        section.instruments = instruments
+        return section
+
     def __mul__(self, other: int):
-        return Instrumentation(*[self for _ in range(other)])
+        return Instrumentation._make([self for _ in range(other)])
 
     def __eq__(self, other):
         if not isinstance(other, Section):
@@ -417,6 +869,7 @@ class Section:
         return hash(tuple(sorted(self.instruments, key=lambda i: i.name)))
 
 
+@cache_dispatch
 class Instrumentation:
     @multimethod
     def __init__(self):
@@ -437,14 +890,22 @@ class Instrumentation:
         else:
             self.sections = list(sections)
 
+    @classmethod
+    def _make(cls, sections: List[Section]) -> 'Instrumentation':
+        instrumentation = object.__new__(cls)
+        instrumentation.sections = sections
+        return instrumentation
+
     def __getitem__(self, key):
-        return Instrumentation(self.sections[key])
+        if not isinstance(key, slice):
+            return Instrumentation._make([self.sections[key]])
+        return Instrumentation._make(self.sections[key])
 
     def __len__(self):
         return len(self.sections)
 
     def __add__(self, other: 'Instrumentation') -> 'Instrumentation':
-        return Instrumentation(self.sections + other.sections)
+        return Instrumentation._make(self.sections + other.sections)
 
     @multimethod
     def __mul__(self, harmony: Harmony) -> 'HarmonicInstrumentation':
@@ -465,6 +926,8 @@ class Instrumentation:
 
 # Time-Frequency
 class Note:
+    __slots__ = ('pitch', 'onset', 'duration', 'instrument')
+
     def __init__(self, pitch: Pitch, onset: frac, duration: frac, instrument: Instrument):
         self.pitch = pitch
         self.onset = onset
@@ -499,6 +962,12 @@ class Note:
         return self.pitch.number
 
 
+def note_order(note: Note) -> Tuple[frac, int, frac, str]:
+    # Order of the notes streamed by iter_notes and of ordered_notes
+    return note.onset, note.pitch.number, note.duration, note.instrument.name
+
+
+@cache_dispatch
 class HarmonicTexture:
     @multimethod
     def __init__(self):
@@ -524,11 +993,19 @@ class HarmonicTexture:
         self.harmony = harmony[:min_length]
         self.texture = texture[:min_length]
 
+    @classmethod
+    def _make(cls, harmony: Harmony, texture: Texture) -> 'HarmonicTexture':
+        # The factors must have the same length, which the operators preserve
+        harmonic_texture = object.__new__(cls)
+        harmonic_texture.harmony = harmony
+        harmonic_texture.texture = texture
+        return harmonic_texture
+
     def __or__(self, other: 'HarmonicTexture') -> 'HarmonicTexture':
-        return HarmonicTexture(self.harmony + other.harmony, self.texture + other.texture)
+        return HarmonicTexture._make(self.harmony + other.harmony, self.texture + other.texture)
 
     def __sub__(self, other: 'HarmonicTexture') -> 'HarmonicTexture':
-        return HarmonicTexture(self.harmony + other.harmony, self.texture - other.texture)
+        return HarmonicTexture._make(self.harmony + other.harmony, self.texture - other.texture)
 
     def __mul__(self, other: Instrumentation) -> 'TensorContraction':
         return TensorContraction(self.harmony, self.texture, other)
@@ -538,26 +1015,56 @@ class HarmonicTexture:
             return False
         return self.harmony == other.harmony and self.texture == other.texture
 
+    def to_note_array(self, instrument_name: str = 'Acoustic Grand Piano') -> 'NoteArray':
+        from .array import NoteArray, TextureArray, HarmonyArray
+        from .cache import fingerprint, fingerprint_arrays, note_cache
+        groups = [(Instrument(instrument_name),)] * len(self.texture)
+        if isinstance(self.texture, TextureArray) and isinstance(self.harmony, HarmonyArray):
+            voices_fingerprint = fingerprint_arrays(self.harmony, self.texture, groups)
+        else:
+            voices_fingerprint = fingerprint(zip(self.texture.rhythms, self.harmony.chords, groups))
+
+        def compute():
+            note_cache.check_budget(self.estimate_note_count())
+            return NoteArray.from_factors(self.harmony, self.texture, groups)
+
+        return note_cache.materialize(voices_fingerprint, compute)
+
+    def estimate_note_count(self) -> int:
+        # Notes before duplicates are removed, an upper bound of len(notes())
+        return sum(h * p for h, p in zip(self.texture.hit_counts(), self.harmony.pitch_counts()))
+
+    @property
+    def extent(self) -> Optional[Tuple[frac, frac]]:
+        return self.texture.extent
+
+    def pitch_range(self) -> Optional[Tuple[int, int]]:
+        return self.harmony.pitch_range([h != 0 for h in self.texture.hit_counts()])
+
     def notes(self, instrument_name: str = 'Acoustic Grand Piano'):
-        result = set()
+        return self.to_note_array(instrument_name).to_notes()
 
-        instrument = Instrument(instrument_name)
+    def lazy(self, instrument_name: str = 'Acoustic Grand Piano') -> 'Expression':
+        section = Section._make({Instrument(instrument_name)})
+        return Leaf(self * Instrumentation._make([section for _ in range(len(self.texture))]))
 
-        for rhythm, chord in zip(self.texture.rhythms, self.harmony.chords):
-            for hit in rhythm.hits:
-                for pitch in chord.pitches:
-                    result.add(Note(pitch, hit.onset, hit.duration, instrument))
-        return result
+    def iter_notes(self, instrument_name: str = 'Acoustic Grand Piano') -> Iterator['Note']:
+        from .cache import note_cache
+        from .stream import iter_voices
+        note_cache.check_budget(self.estimate_note_count())
+        instruments = (Instrument(instrument_name),)
+        return iter_voices((rhythm, chord, instruments)
+                           for rhythm, chord in zip(self.texture.rhythms, self.harmony.chords))
 
     def ordered_notes(self, instrument_name: str = 'Acoustic Grand Piano'):
-        notes = self.notes(instrument_name)
-        return sorted(notes, key=lambda note: (note.onset, note.pitch.number))
+        return list(self.iter_notes(instrument_name))
 
     def to_midi(self, velocity=64, bpm=100):
         from .midi import to_midi
-        return to_midi(self.notes(), velocity, bpm)
+        return to_midi(self.to_note_array(), velocity, bpm)
 
 
+@cache_dispatch
 class HarmonicInstrumentation:
     @multimethod
     def __init__(self):
@@ -589,6 +1096,7 @@ class HarmonicInstrumentation:
         return self.harmony == other.harmony and self.instrumentation == other.instrumentation
 
 
+@cache_dispatch
 class InstrumentedTexture:
     @multimethod
     def __init__(self):
@@ -625,7 +1133,12 @@ class InstrumentedTexture:
     def __mul__(self, other: Harmony) -> 'TensorContraction':
         return TensorContraction(other, self.texture, self.instrumentation)
 
+    def compile(self) -> 'Template':
+        from .array import Template
+        return Template(self.texture, self.instrumentation)
+
 
+@cache_dispatch
 class TensorContraction:
     @multimethod
     def __init__(self):
@@ -647,34 +1160,97 @@ class TensorContraction:
                           f"Harmony: {len(harmony)}, "
                           f"Texture: {len(texture)}, "
                           f"Instrumentation: {len(instrumentation)}")
+        # Sliced copies, so that the fingerprint and the cached notes follow no later change of the factors given
         min_length = min(len(harmony), len(texture), len(instrumentation))
         self.texture = texture[:min_length]
         self.harmony = harmony[:min_length]
         self.instrumentation = instrumentation[:min_length]
 
+    @classmethod
+    def _make(cls, harmony: Harmony, texture: Texture, instrumentation: Instrumentation,
+              shift: frac = frac(0), transposition: int = 0) -> 'TensorContraction':
+        # The factors must have the same length, which the operators preserve
+        tensor_contraction = object.__new__(cls)
+        tensor_contraction._harmony = harmony
+        tensor_contraction._texture = texture
+        tensor_contraction.instrumentation = instrumentation
+        tensor_contraction.shift = shift
+        tensor_contraction.transposition = transposition
+        return tensor_contraction
+
+    # Shifts and transpositions are kept as pending offsets over shared factors, and only applied to the factors
+    # when they are read
+    @property
+    def harmony(self) -> Harmony:
+        if self.transposition != 0:
+            self._harmony = self._harmony + self.transposition
+            self.transposition = 0
+        return self._harmony
+
+    @harmony.setter
+    def harmony(self, harmony: Harmony):
+        self.__dict__.pop('_fingerprint', None)
+        self._harmony = harmony
+        self.transposition = 0
+
+    @property
+    def texture(self) -> Texture:
+        if self.shift != 0:
+            self._texture = self._texture + self.shift
+            self.shift = frac(0)
+        return self._texture
+
+    @texture.setter
+    def texture(self, texture: Texture):
+        for cache in ('_fingerprint', '_index'):
+            self.__dict__.pop(cache, None)
+        self._texture = texture
+        self.shift = frac(0)
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        return self._instrumentation
+
+    @instrumentation.setter
+    def instrumentation(self, instrumentation: Instrumentation):
+        self.__dict__.pop('_fingerprint', None)
+        self._instrumentation = instrumentation
+
+    @property
+    def extent(self) -> Optional[Tuple[frac, frac]]:
+        return _shift(self._texture.extent, self.shift)
+
     def __or__(self, other: 'TensorContraction') -> 'TensorContraction':
+        if isinstance(other, Expression):
+            return self.lazy() | other
+
         new_harmony = self.harmony + other.harmony if self.harmony is not None else other.harmony
         new_texture = self.texture + other.texture if self.texture is not None else other.texture
         new_instrumentation = self.instrumentation + other.instrumentation \
             if self.instrumentation is not None else other.instrumentation
-        return TensorContraction(new_harmony, new_texture, new_instrumentation)
+        return TensorContraction._make(new_harmony, new_texture, new_instrumentation)
 
     def __sub__(self, other: 'TensorContraction') -> 'TensorContraction':
+        if isinstance(other, Expression):
+            return self.lazy() - other
+
         new_harmony = self.harmony + other.harmony if self.harmony is not None else other.harmony
         new_texture = self.texture - other.texture if self.texture is not None else other.texture
         new_instrumentation = self.instrumentation + other.instrumentation \
             if self.instrumentation is not None else other.instrumentation
-        return TensorContraction(new_harmony, new_texture, new_instrumentation)
+        return TensorContraction._make(new_harmony, new_texture, new_instrumentation)
 
     @multimethod
     def __add__(self, other: frac):
-        new_texture = self.texture + other if self.texture is not None else None
-        return TensorContraction(self.harmony, new_texture, self.instrumentation)
+        result = TensorContraction._make(self._harmony, self._texture, self.instrumentation,
+                                         self.shift + other, self.transposition)
+        return self._moved(result, shift=other)
 
     @multimethod
     def __add__(self, other: int):
-        new_harmony = self.harmony + other if self.harmony is not None else None
-        return TensorContraction(new_harmony, self.texture, self.instrumentation)
+        result = TensorContraction._make(self._harmony, self._texture, self.instrumentation,
+                                         self.shift, self.transposition + other)
+        return self._moved(result, transposition=other)
 
     def __mul__(self, other: int) -> 'TensorContraction':
         # Concatenante the tensor contraction with itself other times
@@ -683,7 +1259,35 @@ class TensorContraction:
         elif other == 1:
             return self
         else:
-            return self - (self * (other - 1))
+            return TensorContraction.concatenate(*(self for _ in range(other)))
+
+    @classmethod
+    def concatenate(cls, *tensor_contractions: 'TensorContraction') -> 'TensorContraction':
+        return cls._join(tensor_contractions, sequential=True)
+
+    @classmethod
+    def parallelize(cls, *tensor_contractions: 'TensorContraction') -> 'TensorContraction':
+        return cls._join(tensor_contractions, sequential=False)
+
+    @classmethod
+    def _join(cls, tensor_contractions, sequential: bool) -> 'TensorContraction':
+        # Array-backed factors keep their storage when any of the operands uses it
+        from .array import TextureArray, HarmonyArray
+        harmonies = [tc.harmony for tc in tensor_contractions]
+        textures = [tc.texture for tc in tensor_contractions]
+
+        if any(isinstance(h, HarmonyArray) for h in harmonies):
+            harmony = HarmonyArray.concatenate(*harmonies)
+        else:
+            harmony = Harmony._make([c for h in harmonies for c in h.chords])
+        texture_class = TextureArray if any(isinstance(t, TextureArray) for t in textures) else Texture
+        if sequential:
+            texture = texture_class.concatenate(*textures)
+        else:
+            texture = texture_class.parallelize(*textures)
+        instrumentation = Instrumentation._make([s for tc in tensor_contractions
+                                                 for s in tc.instrumentation.sections])
+        return cls._make(harmony, texture, instrumentation)
 
     def __eq__(self, other):
         if not isinstance(other, TensorContraction):
@@ -693,20 +1297,381 @@ class TensorContraction:
         same_instrumentation = self.instrumentation == other.instrumentation
         return same_texture and same_harmony and same_instrumentation
 
-    def notes(self) -> Set['Note']:
-        result = set()
+    def voices(self) -> Iterator[Tuple[Rhythm, Chord, Set[Instrument]]]:
+        return ((rhythm, chord, group.instruments) for rhythm, chord, group
+                in zip(self.texture.rhythms, self.harmony.chords, self.instrumentation.sections))
 
-        for rhythm, chord, group in zip(self.texture.rhythms, self.harmony.chords, self.instrumentation.sections):
-            for hit in rhythm.hits:
-                for pitch in chord.pitches:
-                    for instrument in group.instruments:
-                        result.add(Note(pitch, hit.onset, hit.duration, instrument))
+    @property
+    def fingerprint(self) -> Tuple[Hashable, frac, int]:
+        # Structure of the notes up to a shift and a transposition, see cache.fingerprint
+        try:
+            return self._fingerprint
+        except AttributeError:
+            pass
+
+        # Computed on the stored factors, then moved by the pending offsets
+        from .array import TextureArray, HarmonyArray
+        from .cache import fingerprint, fingerprint_arrays
+        harmony, texture = self._harmony, self._texture
+        groups = [s.instruments for s in self.instrumentation.sections]
+        if isinstance(texture, TextureArray) and isinstance(harmony, HarmonyArray):
+            key, start, low = fingerprint_arrays(harmony, texture, groups)
+        else:
+            key, start, low = fingerprint(zip(texture.rhythms, harmony.chords, groups))
+        self._fingerprint = key, start + self.shift, low + self.transposition
+        return self._fingerprint
+
+    def _moved(self, result: 'TensorContraction', shift: frac = frac(0), transposition: int = 0):
+        # A shifted or transposed copy has the fingerprint of the original with moved offsets
+        fingerprint = self.__dict__.get('_fingerprint')
+        if fingerprint is not None:
+            key, start, low = fingerprint
+            result._fingerprint = key, start + shift, low + transposition
         return result
 
+    def to_note_array(self) -> 'NoteArray':
+        from .array import NoteArray
+        from .cache import note_cache
+        harmony, texture, shift, transposition = self._harmony, self._texture, self.shift, self.transposition
+        groups = [s.instruments for s in self.instrumentation.sections]
+
+        def compute():
+            note_cache.check_budget(self.estimate_note_count())
+            return NoteArray.from_factors(harmony, texture, groups).shifted(shift, transposition)
+
+        return note_cache.materialize(self.fingerprint, compute)
+
+    def _sizes(self) -> List[Tuple[int, int, int]]:
+        # Hits, pitches and instruments of each voice
+        return list(zip(self._texture.hit_counts(), self._harmony.pitch_counts(),
+                        [len(s.instruments) for s in self.instrumentation.sections]))
+
+    def estimate_note_count(self) -> int:
+        """
+        Number of notes before duplicates are removed, computed from the sizes of the factors.
+
+        It is an upper bound of ``len(notes())``, exact when no two voices produce the same note.
+        """
+        return sum(h * p * i for h, p, i in self._sizes())
+
+    def pitch_range(self) -> Optional[Tuple[int, int]]:
+        pitch_range = self._harmony.pitch_range([h * p * i != 0 for h, p, i in self._sizes()])
+        if pitch_range is None:
+            return None
+        return pitch_range[0] + self.transposition, pitch_range[1] + self.transposition
+
+    @property
+    def instruments(self) -> Set['Instrument']:
+        sections = self.instrumentation.sections
+        return {i for (h, p, _), s in zip(self._sizes(), sections) if h * p != 0 for i in s.instruments}
+
+    def notes(self) -> Set['Note']:
+        return self.to_note_array().to_notes()
+
+    def lazy(self) -> 'Expression':
+        return Leaf(self)
+
+    @property
+    def index(self) -> 'IntervalIndex':
+        # Built on the first time-window query
+        try:
+            return self._index
+        except AttributeError:
+            pass
+
+        from .array import IntervalIndex
+        self._index = IntervalIndex(self.texture.rhythms)
+        return self._index
+
+    def crop(self, start: frac, end: frac, clip: bool = True) -> 'TensorContraction':
+        """
+        Voices with hits sounding between start and end, restricted to those hits.
+
+        The hits are clipped to the window, unless ``clip`` is False. The cost depends on the number of hits in
+        the window, not on the size of the contraction.
+        """
+        index = self.index
+        positions = index.query(start, end)
+
+        voices = {}
+        for voice, onset, duration in zip(index.voice[positions].tolist(), index.onset[positions].tolist(),
+                                          index.duration[positions].tolist()):
+            voices.setdefault(voice, set()).add((onset, duration))
+
+        resolution = index.resolution
+        if clip:
+            start, end = frac(start), frac(end)
+            resolution = lcm(resolution, start.denominator, end.denominator)
+            factor = resolution // index.resolution
+            low = start.numerator * (resolution // start.denominator)
+            high = end.numerator * (resolution // end.denominator)
+            for voice, ticks in voices.items():
+                clipped = set()
+                for onset, duration in ticks:
+                    onset, offset = max(onset * factor, low), min((onset + duration) * factor, high)
+                    clipped.add((onset, offset - onset))
+                voices[voice] = clipped
+
+        order = sorted(voices)
+        return TensorContraction._make(Harmony._make([self.harmony.chords[v] for v in order]),
+                                       Texture._make([Rhythm._from_ticks(voices[v], resolution) for v in order]),
+                                       Instrumentation._make([self.instrumentation.sections[v] for v in order]))
+
+    def notes_between(self, start: frac, end: frac) -> Set['Note']:
+        """
+        Notes sounding between start and end, i.e. with onset < end and onset + duration > start.
+        """
+        return self.crop(start, end, clip=False).notes()
+
+    def iter_notes(self) -> Iterator['Note']:
+        """
+        Notes in onset order, then by pitch, computed as they are consumed.
+        """
+        from .cache import note_cache
+        from .stream import iter_voices
+        note_cache.check_budget(self.estimate_note_count())
+        return iter_voices(self.voices())
+
     def ordered_notes(self) -> List['Note']:
-        notes = self.notes()
-        return sorted(notes, key=lambda note: (note.onset, note.pitch.number))
+        return list(self.iter_notes())
 
     def to_midi(self, velocity=64, bpm=100):
         from .midi import to_midi
-        return to_midi(self.notes(), velocity, bpm)
+        return to_midi(self.to_note_array(), velocity, bpm)
+
+
+# Lazy expressions
+@cache_dispatch
+class Expression:
+    """
+    Node of a lazily evaluated score.
+
+    The ``|``, ``-``, ``+`` and ``*`` operators build a graph of nodes instead of copying the harmony, texture and
+    instrumentation of their operands. Notes are only computed by ``to_note_array()`` and the methods built on it,
+    and a node reachable through several paths (e.g. a block used many times) is materialized once per evaluation.
+    """
+    children: Tuple['Expression', ...] = ()
+    extent: Optional[Tuple[frac, frac]] = None
+    note_count: int = 0
+
+    def __or__(self, other: Union['Expression', 'TensorContraction']) -> 'Expression':
+        return Parallel(self, other if isinstance(other, Expression) else Leaf(other))
+
+    def __sub__(self, other: Union['Expression', 'TensorContraction']) -> 'Expression':
+        return Concatenate(self, other if isinstance(other, Expression) else Leaf(other))
+
+    @multimethod
+    def __add__(self, other: frac) -> 'Expression':
+        return Shift(self, other)
+
+    @multimethod
+    def __add__(self, other: int) -> 'Expression':
+        return Transpose(self, other)
+
+    def __mul__(self, other: int) -> 'Expression':
+        if other <= 0:
+            raise ValueError("The multiplication factor must be a positive integer.")
+        elif other == 1:
+            return self
+        else:
+            return Repeat(self, other)
+
+    @property
+    def endpoint(self) -> frac:
+        if self.extent is None:
+            return frac(0)
+        return max(frac(0), self.extent[1])
+
+    def estimate_note_count(self) -> int:
+        # Upper bound of len(notes()), summed over the leaves as they are used
+        return self.note_count
+
+    def references(self) -> List[Tuple['Expression', int]]:
+        return [(child, 1) for child in self.children]
+
+    def expand(self, stack: list, pieces: list, shift: frac, transposition: int, materialized: dict):
+        raise NotImplementedError
+
+    def post_order(self) -> List['Expression']:
+        order = []
+        visited = set()
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+            elif id(node) not in visited:
+                visited.add(id(node))
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
+        return order
+
+    def _reference_counts(self, order: List['Expression']) -> Dict[int, int]:
+        # Number of times each node is used, by id
+        references = {id(self): 1}
+        for node in order:
+            for child, count in node.references():
+                references[id(child)] = references.get(id(child), 0) + count
+        return references
+
+    def to_note_array(self) -> 'NoteArray':
+        from .array import NoteArray
+        from .cache import note_cache
+
+        # Every node counts at most the notes of the root, so the tiles and merges below all fit in the budget
+        note_cache.check_budget(self.note_count)
+        order = self.post_order()
+        references = self._reference_counts(order)
+
+        # Children come first in the post-order, so shared nodes are materialized before the nodes using them
+        materialized = {}
+        for node in order:
+            if node is not self and references[id(node)] == 1:
+                continue
+
+            pieces = []
+            stack = [(node, frac(0), 0)]
+            while stack:
+                child, shift, transposition = stack.pop()
+                if child is not node and id(child) in materialized:
+                    pieces.append((materialized[id(child)], shift, transposition))
+                else:
+                    child.expand(stack, pieces, shift, transposition, materialized)
+            materialized[id(node)] = NoteArray.merge(pieces)
+
+        return materialized[id(self)]
+
+    def evaluate(self) -> 'TensorContraction':
+        order = self.post_order()
+        references = self._reference_counts(order)
+
+        # A chain of nodes of the same kind (e.g. a - b - c, built as (a - b) - c) is joined once at its top node,
+        # over the operands of all its nodes; the nodes of the chain used only there are not evaluated
+        inlined = set()
+        for node in order:
+            if isinstance(node, (Parallel, Concatenate)):
+                inlined.update(id(child) for child in node.children
+                               if type(child) is type(node) and references[id(child)] == 1)
+
+        evaluated = {}
+        for node in order:
+            if id(node) in inlined:
+                continue
+            operands = []
+            stack = list(reversed(node.children))
+            while stack:
+                child = stack.pop()
+                if id(child) in inlined:
+                    stack.extend(reversed(child.children))
+                else:
+                    operands.append(evaluated[id(child)])
+            evaluated[id(node)] = node.apply(*operands)
+        return evaluated[id(self)]
+
+    def apply(self, *children: 'TensorContraction') -> 'TensorContraction':
+        raise NotImplementedError
+
+    def notes(self) -> Set['Note']:
+        return self.to_note_array().to_notes()
+
+    def ordered_notes(self) -> List['Note']:
+        return sorted(self.notes(), key=note_order)
+
+    def to_midi(self, velocity=64, bpm=100):
+        from .midi import to_midi
+        return to_midi(self.to_note_array(), velocity, bpm)
+
+
+class Leaf(Expression):
+    def __init__(self, tensor_contraction: TensorContraction):
+        self.tensor_contraction = tensor_contraction
+
+        self.extent = tensor_contraction.extent
+        self.note_count = tensor_contraction.estimate_note_count()
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        pieces.append((self.tensor_contraction.to_note_array(), shift, transposition))
+
+    def apply(self):
+        return self.tensor_contraction
+
+
+class Parallel(Expression):
+    def __init__(self, *children: Expression):
+        self.children = children
+        for child in children:
+            self.extent = _union(self.extent, child.extent)
+        self.note_count = sum(child.note_count for child in children)
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        stack.extend((child, shift, transposition) for child in self.children)
+
+    def apply(self, *children):
+        return TensorContraction.parallelize(*children)
+
+
+class Concatenate(Expression):
+    def __init__(self, *children: Expression):
+        self.children = children
+        self.offsets = []
+        offset = frac(0)
+        for child in children:
+            self.offsets.append(offset)
+            self.extent = _union(self.extent, _shift(child.extent, offset))
+            offset += child.endpoint
+        self.note_count = sum(child.note_count for child in children)
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        stack.extend((child, shift + offset, transposition) for child, offset in zip(self.children, self.offsets))
+
+    def apply(self, *children):
+        return TensorContraction.concatenate(*children)
+
+
+class Shift(Expression):
+    def __init__(self, child: Expression, shift: frac):
+        self.children = (child,)
+        self.shift = shift
+        self.extent = _shift(child.extent, shift)
+        self.note_count = child.note_count
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        stack.append((self.children[0], shift + self.shift, transposition))
+
+    def apply(self, child):
+        return child + self.shift
+
+
+class Transpose(Expression):
+    def __init__(self, child: Expression, transposition: int):
+        self.children = (child,)
+        self.transposition = transposition
+        self.extent = child.extent
+        self.note_count = child.note_count
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        stack.append((self.children[0], shift, transposition + self.transposition))
+
+    def apply(self, child):
+        return child + self.transposition
+
+
+class Repeat(Expression):
+    def __init__(self, child: Expression, times: int):
+        self.children = (child,)
+        self.times = times
+        self.period = child.endpoint
+        self.extent = None if child.extent is None else \
+            (child.extent[0], child.extent[1] + self.period * (times - 1))
+        self.note_count = child.note_count * times
+
+    def references(self):
+        return [(self.children[0], self.times)]
+
+    def expand(self, stack, pieces, shift, transposition, materialized):
+        # The child is referenced several times, so it is always materialized first
+        notes = materialized[id(self.children[0])]
+        pieces.append((notes.tile(self.times, self.period), shift, transposition))
+
+    def apply(self, child):
+        return child * self.times
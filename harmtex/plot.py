@@ -13,19 +13,18 @@ def plot_notes(tensor_contraction: TensorContraction,
                x_tick_end=None,
                x_tick_step=None,
                ):
-    notes = tensor_contraction.notes()
+    notes = tensor_contraction.to_note_array()
 
-    fig = plt.figure(figsize=figsize)
-    for note in notes:
-        plt.hlines(note.frequency, float(note.start), float(note.end), color='black', linewidth=linewidth)
+    starts = notes.onset / notes.resolution
+    ends = (notes.onset + notes.duration) / notes.resolution
 
-    for note in notes:
-        plt.hlines(note.frequency, float(note.start - eps), float(note.start + eps), color='red', linewidth=2*linewidth)
-        # plt.vlines(float(note.start), note.frequency - eps, note.frequency + eps, color='red', linewidth=linewidth)
+    fig = plt.figure(figsize=figsize)
+    plt.hlines(notes.pitch, starts, ends, color='black', linewidth=linewidth)
+    plt.hlines(notes.pitch, starts - eps, starts + eps, color='red', linewidth=2*linewidth)
 
     # Set y-axis
-    min_freq = min(note.frequency for note in notes)
-    max_freq = max(note.frequency for note in notes)
+    min_freq = int(notes.pitch.min())
+    max_freq = int(notes.pitch.max())
     ambitus = max_freq - min_freq
     plt.ylim(min_freq - 1, max_freq + 1)
     plt.yticks(range(min_freq, max_freq + 1, ambitus // 5))
@@ -36,9 +35,9 @@ def plot_notes(tensor_contraction: TensorContraction,
 
     # Set x-axis
     if x_tick_start is None:
-        x_tick_start = min(note.start for note in notes)
+        x_tick_start = notes.start
     if x_tick_end is None:
-        x_tick_end = max(note.end for note in notes)
+        x_tick_end = notes.end
     if x_tick_step is None:
         x_tick_step = (x_tick_end - x_tick_start) / 10
     n_x_ticks = int((x_tick_end - x_tick_start) / x_tick_step)
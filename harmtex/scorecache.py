@@ -0,0 +1,102 @@
+import hashlib
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def default_directory() -> Path:
+    return Path(os.environ.get('HARMTEX_CACHE_DIR', Path.home() / '.cache' / 'harmtex'))
+
+
+class ScoreCache:
+    """
+    Compiled scores on disk, keyed by the hash of the XML bytes, the version of harmtex and whether the score was
+    validated.
+
+    Each entry is a zlib-compressed pickle of the decoded score in its own file. Loading an entry touches it, and
+    the least recently used entries are removed once the directory holds more than ``max_bytes``.
+    """
+    SUFFIX = '.score'
+
+    def __init__(self, directory: Path = None, max_bytes: int = 256 * 2 ** 20):
+        self.directory = Path(directory) if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"ScoreCache({self.directory}, {self.size()} / {self.max_bytes} bytes)"
+
+    @staticmethod
+    def key(data: bytes, validate: bool = False) -> str:
+        # A score compiled without validation is never served to a compilation asking for it
+        from . import __version__
+        return hashlib.sha256(f'{__version__}\0{int(validate)}\0'.encode() + data).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / (key + self.SUFFIX)
+
+    def load(self, key: str) -> Optional[Dict]:
+        path = self.path(key)
+        try:
+            state = pickle.loads(zlib.decompress(path.read_bytes()))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable entries are dropped and compiled again
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return state
+
+    def store(self, key: str, state: Dict):
+        data = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        if len(data) > self.max_bytes:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so that concurrent readers never see a partial entry
+        temporary = self.path(key).with_suffix(f'.{os.getpid()}.tmp')
+        temporary.write_bytes(data)
+        os.replace(temporary, self.path(key))
+        self.resize(self.max_bytes)
+
+    def entries(self):
+        if not self.directory.exists():
+            return []
+        return [(entry.stat(), entry) for entry in self.directory.glob('*' + self.SUFFIX)]
+
+    def size(self) -> int:
+        return sum(stat.st_size for stat, _ in self.entries())
+
+    def resize(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        entries = sorted(self.entries(), key=lambda entry: entry[0].st_mtime_ns)
+        size = sum(stat.st_size for stat, _ in entries)
+        for stat, entry in entries:
+            if size <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            size -= stat.st_size
+            self.evictions += 1
+
+    def clear(self):
+        for _, entry in self.entries():
+            entry.unlink(missing_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries()), 'bytes': self.size(), 'max_bytes': self.max_bytes}
+
+
+score_cache = ScoreCache()
@@ -0,0 +1,65 @@
+import heapq
+from itertools import groupby
+from math import lcm
+from operator import itemgetter
+from typing import Collection, Iterable, Iterator, Tuple
+from .model import frac, Pitch, Instrument, Note, Rhythm, Chord
+from .timebase import to_ticks
+
+
+def _voice_notes(rhythm: Rhythm, chord: Chord, instruments: Collection[Instrument], resolution: int, index: int):
+    # Sorted by (onset, pitch, duration, instrument): the hits of an onset are expanded together
+    pitches = chord.numbers
+    instruments = sorted(instruments, key=lambda i: i.name)
+    for onset, hits in groupby(sorted(rhythm.ticks(resolution)), key=itemgetter(0)):
+        durations = [duration for _, duration in hits]
+        for pitch in pitches:
+            for duration in durations:
+                for instrument in instruments:
+                    yield onset, pitch, duration, instrument.name, index, instrument
+
+
+def iter_voices(voices: Iterable[Tuple[Rhythm, Chord, Collection[Instrument]]]) -> Iterator[Note]:
+    """
+    Unique notes of the voices in (onset, pitch, duration, instrument name) order.
+
+    The sorted notes of each voice are merged through a heap, and a voice only enters the heap once the merge
+    reaches its first onset. Apart from the voices themselves, memory depends on the number of voices sounding
+    together, not on the number of notes.
+    """
+    voices = [(rhythm, chord, group) for rhythm, chord, group in voices
+              if rhythm.extent is not None and len(chord) != 0 and len(group) != 0]
+    resolution = lcm(1, *{rhythm.resolution for rhythm, _, _ in voices})
+    pending = sorted((to_ticks(rhythm.extent[0], resolution), index) for index, (rhythm, _, _) in enumerate(voices))
+    pending.reverse()
+
+    heap = []
+    previous = None
+    current_onset, onset_time = None, None
+    durations = {}
+    while True:
+        while pending and (not heap or pending[-1][0] <= heap[0][0][0]):
+            _, index = pending.pop()
+            stream = _voice_notes(*voices[index], resolution, index)
+            heapq.heappush(heap, (next(stream), stream))
+        if not heap:
+            return
+
+        item, stream = heap[0]
+        try:
+            heapq.heapreplace(heap, (next(stream), stream))
+        except StopIteration:
+            heapq.heappop(heap)
+
+        onset, pitch, duration, name, _, instrument = item
+        if (onset, pitch, duration, name) == previous:
+            continue
+        previous = onset, pitch, duration, name
+
+        if onset != current_onset:
+            current_onset, onset_time = onset, frac(onset, resolution)
+        try:
+            duration_time = durations[duration]
+        except KeyError:
+            duration_time = durations[duration] = frac(duration, resolution)
+        yield Note(Pitch._make(pitch), onset_time, duration_time, instrument)
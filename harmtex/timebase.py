@@ -0,0 +1,24 @@
+from fractions import Fraction as frac
+from math import lcm
+from typing import Dict, Iterable
+
+
+def resolution_of(times: Iterable[frac]) -> int:
+    """
+    Smallest number of ticks per whole note on which all the times fall.
+    """
+    return lcm(1, *{t.denominator for t in times})
+
+
+def to_ticks(time: frac, resolution: int) -> int:
+    ticks, remainder = divmod(time.numerator * resolution, time.denominator)
+    if remainder != 0:
+        raise ValueError(f"Time {time} does not fall on a grid of {resolution} ticks per whole note.")
+    return ticks
+
+
+def to_times(ticks: Iterable[int], resolution: int) -> Dict[int, frac]:
+    """
+    Time of each distinct tick, so that every Fraction is built only once.
+    """
+    return {t: frac(t, resolution) for t in set(ticks)}
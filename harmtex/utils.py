@@ -3,4 +3,49 @@ def midi_number_to_pitch(number: int) -> str:
     chroma = number % 12
     octave = number // 12 - 1
     chroma_str = ['C', 'C#', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B'][chroma]
-    return f'{chroma_str}{octave}'
\ No newline at end of file
+    return f'{chroma_str}{octave}'
+
+
+def _dispatch_key(value):
+    # Type of the value and, for containers, of their first item, which is what the overloads are told apart by
+    cls = type(value)
+    if cls is tuple:
+        return (cls,) + tuple(_dispatch_key(item) for item in value)
+    if cls in (list, set, frozenset):
+        for item in value:
+            return cls, _dispatch_key(item)
+        return cls, None
+    return cls
+
+
+def cache_dispatch(cls):
+    """
+    Class decorator caching the overload selected by each multimethod of the class.
+
+    ``multimethod`` checks every item of a container argument against the ``List[...]``/``Set[...]`` annotations on
+    every call. The selection is cached here by the types of the arguments and of the first item of each container.
+Calls with keyword arguments are not cached.
+    """
+    from functools import wraps
+    from multimethod import multimethod
+
+    def cached(method: multimethod):
+        cache = {}
+
+        @wraps(method)
+        def dispatch(*args, **kwargs):
+            if kwargs:
+                # Keywords are matched by multimethod itself
+                return method(*args, **kwargs)
+            key = tuple(map(_dispatch_key, args))
+            try:
+                func = cache[key]
+            except KeyError:
+                func = cache[key] = method.dispatch(*args)
+            return func(*args)
+        return dispatch
+
+    for name, attribute in list(vars(cls).items()):
+        if isinstance(attribute, multimethod):
+            setattr(cls, name, cached(attribute))
+    return cls
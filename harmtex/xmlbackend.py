@@ -0,0 +1,118 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional
+import xml.etree.ElementTree as ET
+
+
+# Schema of the scores
+SCHEMA = Path(__file__).parent.parent / 'xml' / 'score.xsd'
+
+
+class Backend:
+    """
+    XML parser of the compiler, on ``xml.etree.ElementTree``.
+
+    Backends return trees and elements with the ElementTree interface, without comments and processing
+    instructions. ``fromstring`` parses a single element, e.g. one definition of a score. With ``validate``, the
+    document is checked against the schema, which the stdlib cannot do.
+    """
+    name = 'etree'
+
+    def parse(self, file_path: Path, validate: bool = False):
+        self._check(validate)
+        return ET.parse(file_path)
+
+    def iterparse(self, file_path: Path, events=('end',), validate: bool = False):
+        self._check(validate)
+        return ET.iterparse(file_path, events=events)
+
+    def fromstring(self, data: bytes):
+        return ET.fromstring(data)
+
+    def too_deep(self, error: Exception, validate: bool = False) -> bool:
+        # Whether the parser failed on its limit of depth, which the stdlib parser does not have
+        return False
+
+    def _check(self, validate: bool):
+        if validate:
+            raise NotImplementedError(f"The '{self.name}' XML backend cannot validate scores, install lxml.")
+
+    def __repr__(self):
+        return f"{type(self).__name__}('{self.name}')"
+
+
+class LxmlBackend(Backend):
+    """
+    XML parser of the compiler, on ``lxml``, which parses faster and validates against ``score.xsd`` with a schema
+    compiled once.
+
+    libxml2 rejects documents nested deeper than a fixed limit. Unless they are validated, ``parse`` and
+    ``fromstring`` read them with the stdlib instead, and so does a streaming compilation.
+    """
+    name = 'lxml'
+
+    def __init__(self, schema: Path = SCHEMA):
+        from lxml import etree
+
+        self.etree = etree
+        self.parser = etree.XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+        self.schema_path = schema
+        self._schema = None
+
+    def parse(self, file_path: Path, validate: bool = False):
+        try:
+            tree = self.etree.parse(str(file_path), self.parser)
+        except self.etree.XMLSyntaxError as error:
+            if not self.too_deep(error, validate):
+                raise
+            return ET.parse(file_path)
+        if validate:
+            self.schema.assertValid(tree)
+        return tree
+
+    def iterparse(self, file_path: Path, events=('end',), validate: bool = False):
+        # The schema is checked as the document is read
+        return self.etree.iterparse(str(file_path), events=events, remove_comments=True, remove_pis=True,
+                                    huge_tree=True, schema=self.schema if validate else None)
+
+    def fromstring(self, data: bytes):
+        try:
+            return self.etree.fromstring(data, self.parser)
+        except self.etree.XMLSyntaxError as error:
+            if not self.too_deep(error):
+                raise
+            return ET.fromstring(data)
+
+    def too_deep(self, error: Exception, validate: bool = False) -> bool:
+        # The schema cannot be checked by the stdlib
+        return not validate and isinstance(error, self.etree.XMLSyntaxError) and 'Excessive depth' in str(error)
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = self.etree.XMLSchema(self.etree.parse(str(self.schema_path)))
+        return self._schema
+
+
+BACKENDS = {'etree': Backend, 'lxml': LxmlBackend}
+_backends: Dict[str, Backend] = {}
+
+
+def get_backend(name: Optional[str] = None) -> Backend:
+    """
+    XML backend by name. By default, ``$HARMTEX_XML_BACKEND`` if set, else the stdlib, so that scores are read the
+    same way whichever packages are installed; lxml is used only when asked for.
+    """
+    if name is None:
+        name = os.environ.get('HARMTEX_XML_BACKEND', 'etree')
+
+    try:
+        return _backends[name]
+    except KeyError:
+        pass
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown XML backend '{name}', expected one of {', '.join(BACKENDS)}.")
+    backend = _backends[name] = backend_class()
+    return backend
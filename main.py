@@ -1,6 +1,6 @@
 from pathlib import Path
 from harmtex.compiler import ScoreTree
 
-score_tree = ScoreTree(Path('xml/symphony-mozart.xml'))
+score_tree = ScoreTree(Path('xml/symphony-mozart.xml'), cache=True)
 midi = score_tree.to_midi()
 midi.write('midi/symphony-mozart.mid')
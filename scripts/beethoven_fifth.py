@@ -137,7 +137,7 @@ phrase_2 = concatenation(ot * h_I, ot * h_V + frac(-1, 2))
 t_1 = t_main_head_bis - (t_half * frac(4, 4))
 m_4 = t_1 * (octave_4 + h_6) * (s_violin * 3) | (t_half + frac(1, 2)) * (octave_4 + h_ton) * cello_basson
 m_5 = t_1 * (octave_4 + h_6_) * (Section(violin, viola) * 3) | (t_half + frac(1, 2)) * (octave_4 + h_led_) * cello_basson
-m_6 = concatenation(m_4, m_5 + frac(-1, 2))
+m_6 = concatenation(m_4, m_5 + frac(-1, 2)).lazy()
 phrase_3 = m_6 - (m_6 + frac(-1, 2))
 
 ## Phrase 4
@@ -39,7 +39,7 @@ def generate_dotted_half_block(harmony: Harmony, tonic: Pitch = G3):
     block_accompaniment = tonic + t_accompaniment_3 * h_accompaniment_3 * o_accompaniment
 
     block = parallelization(block_bass, block_accompaniment)
-    return block
+    return block.lazy()
 
 
 # Harmony
@@ -0,0 +1,26 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from harmtex import Hit, Chord, Rhythm, Harmony, Texture, Instrument, Section, Instrumentation, TensorContraction
+
+XML = Path(__file__).parent.parent / 'xml'
+
+
+def block() -> TensorContraction:
+    # Two voices with hits off each other's grid, five notes
+    t = Texture(Rhythm(Hit('0', '1/8'), Hit('1/3', '1/4')),
+                Rhythm(Hit('1/8', '1/8')))
+    h = Harmony(Chord({60, 64}), Chord({67}))
+    i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn')))
+    return TensorContraction(h, t, i)
+
+
+def nested_score(depth: int) -> str:
+    # The nocturne with its ast nested in a chain of parallels, written as text since ElementTree serializes
+    # recursively
+    root = ET.parse(XML / 'nocturne-chopin.xml').getroot()
+    ast = root.find('ast')
+    body = ET.tostring(ast[0], encoding='unicode')
+    ast.remove(ast[0])
+    ast.text = 'AST'
+    chain = '<parallel>' * depth + body + '</parallel>' * depth
+    return ET.tostring(root, encoding='unicode').replace('AST', chain)
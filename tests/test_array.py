@@ -0,0 +1,121 @@
+import unittest
+import numpy as np
+from harmtex import frac, Pitch, Hit, Chord, Rhythm, Harmony, Texture, Instrument, Section, Instrumentation, \
+    TensorContraction
+from harmtex.array import contract, unique, NOTE_DTYPE, TextureArray, HarmonyArray
+from harmtex.model import Note, InstrumentedTexture
+
+
+class TestArray(unittest.TestCase):
+    def test_contract(self):
+        # Voice 0: 2 hits x 1 pitch x 2 instruments, voice 1: 1 hit x 2 pitches x 1 instrument
+        data = contract(np.array([0, 4, 8]), np.array([4, 4, 2]), [2, 1],
+                        np.array([60, 64, 67]), [1, 2],
+                        np.array([0, 1, 0]), [2, 1])
+        assert data.tolist() == [(60, 0, 4, 0), (60, 0, 4, 1), (60, 4, 4, 0), (60, 4, 4, 1),
+                                 (64, 8, 2, 0), (67, 8, 2, 0)]
+
+    def test_contract_empty_voices(self):
+        data = contract(np.array([0]), np.array([1]), [1, 0],
+                        np.array([], dtype=np.int64), [0, 0],
+                        np.array([0, 0]), [1, 1])
+        assert len(data) == 0
+
+    def test_unique(self):
+        data = np.array([(62, 1, 1, 0), (-3, 5, 2, 1), (62, 1, 1, 0), (-3, -5, 2, 1)], dtype=NOTE_DTYPE)
+        assert unique(data).tolist() == [(-3, -5, 2, 1), (-3, 5, 2, 1), (62, 1, 1, 0)]
+
+        # Columns too wide to be packed in a single key
+        data = np.array([(0, 2 ** 40, 1, 0), (0, -2 ** 40, 2 ** 30, 0), (0, 2 ** 40, 1, 0)], dtype=NOTE_DTYPE)
+        assert unique(data).tolist() == [(0, -2 ** 40, 2 ** 30, 0), (0, 2 ** 40, 1, 0)]
+
+    def test_set_semantics(self):
+        t = Texture(Rhythm(Hit('-1/8', '1/8'), Hit('1/3', '1/4')),
+                    Rhythm(Hit('1/3', '1/4')),
+                    Rhythm())
+        h = Harmony(Chord({60, 67}), Chord({60}), Chord({72}))
+        i = Instrumentation(Section(Instrument('Violin'), Instrument('Viola')), Section(Instrument('Violin')),
+                            Section(Instrument('Cello')))
+        tc = TensorContraction(h, t, i)
+
+        expected = set()
+        for rhythm, chord, section in zip(t.rhythms, h.chords, i.sections):
+            for hit in rhythm.hits:
+                for pitch in chord.pitches:
+                    for instrument in section.instruments:
+                        expected.add(Note(pitch, hit.onset, hit.duration, instrument))
+
+        assert tc.notes() == expected
+        assert len(tc.to_note_array()) == len(expected) == 8
+        assert tc.to_note_array().start == frac(-1, 8)
+
+    def test_csr_factors(self):
+        t = Texture(Rhythm(Hit('0', '1/8'), Hit('1/3', '1/4')), Rhythm(Hit('1/8', '1/8')), Rhythm())
+        h = Harmony(Chord({60, 64}), Chord({67}), Chord({70}))
+        t_array, h_array = TextureArray.from_texture(t), HarmonyArray.from_harmony(h)
+        assert t_array == t and h_array == h
+        assert t_array.offsets.tolist() == [0, 2, 3, 3] and h_array.offsets.tolist() == [0, 2, 3, 4]
+
+        assert t_array + frac(1, 5) == t + frac(1, 5) and (t_array + frac(1, 5)).extent == (t + frac(1, 5)).extent
+        assert t_array * frac(3, 2) == t * frac(3, 2)
+        assert t_array - t_array == t - t and t_array + t == t + t
+        assert h_array + 2 == h + 2 and h_array + h_array == h + h
+
+        # Slices share the flat arrays
+        assert t_array[1:] == t[1:] and t_array[1:].onset is t_array.onset
+        assert h_array[:2] == h[:2] and h_array[:2].pitch is h_array.pitch
+        assert t_array[::2] == t[::2] and h_array[1] == h[1]
+
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Cello')), Section(Instrument('Tuba')))
+        tc = TensorContraction(h_array, t_array, i)
+        assert tc.notes() == TensorContraction(h, t, i).notes()
+        assert isinstance((tc - tc).texture, TextureArray) and isinstance((tc | tc).harmony, HarmonyArray)
+        assert (tc - tc + frac(1, 3)).notes() == (TensorContraction(h, t, i) * 2 + frac(1, 3)).notes()
+
+    def test_template(self):
+        t = Texture(Rhythm(Hit('0', '1/8'), Hit('1/3', '1/4')), Rhythm(Hit('1/8', '1/8')), Rhythm(Hit('0', '1/8')))
+        i = Instrumentation(Section(Instrument('Tuba'), Instrument('Cello')), Section(Instrument('Viola')),
+                            Section(Instrument('Tuba')))
+        template = InstrumentedTexture(i, t).compile()
+
+        h = Harmony(Chord({60, 64}), Chord({67}), Chord({60}))
+        assert template.contract(h).to_notes() == TensorContraction(h, t, i).notes()
+
+        # The first and last voices give the same note on the first row
+        rows = np.array([[60, 62, 60], [48, 55, 52]])
+        batch = template.contract_batch(rows)
+        assert [len(notes) for notes in batch] == [5, 6]
+        for row, notes in zip(rows.tolist(), batch):
+            expected = TensorContraction(Harmony(*(Chord({p}) for p in row)), t, i).to_note_array()
+            assert notes.to_notes() == expected.to_notes()
+            assert notes.data.tolist() == expected.data.tolist()
+
+        harmonies = [Harmony(*(Chord({p}) for p in row)) for row in rows.tolist()]
+        assert [notes.data.tolist() for notes in template.contract_batch(harmonies)] == \
+            [notes.data.tolist() for notes in batch]
+        with self.assertRaises(ValueError):
+            template.contract_batch([h])
+
+    def test_large_resolution(self):
+        # Coprime denominators whose lcm does not fit in int64
+        denominators = [10000019, 10000079, 10000103, 10000121]
+        t = Texture(*(Rhythm(Hit(frac(1, d), frac(1, d))) for d in denominators))
+        h = Harmony(*(Chord({60 + k}) for k in range(len(denominators))))
+        i = Instrumentation(*(Section(Instrument('Tuba')) for _ in denominators))
+        tc = TensorContraction(h, t, i)
+        assert tc.to_note_array().data.dtype != NOTE_DTYPE
+        assert tc.notes() == {Note(Pitch(60 + k), frac(1, d), frac(1, d), Instrument('Tuba'))
+                              for k, d in enumerate(denominators)}
+
+        moved = (tc - tc + frac(1, 7)) | (tc + 12)
+        assert moved.notes() == set(moved.iter_notes())
+        assert TensorContraction(HarmonyArray.from_harmony(h), TextureArray.from_texture(t), i).notes() == tc.notes()
+        assert InstrumentedTexture(i, t).compile().contract(h).to_notes() == tc.notes()
+        assert tc.notes_between(frac(1, 10000019), 1) == tc.notes()
+
+        repeated = tc.lazy() * 3
+        assert repeated.notes() == set(repeated.evaluate().iter_notes())
+
+
+if __name__ == '__main__':
+    unittest.main()
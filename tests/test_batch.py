@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from pathlib import Path
+from harmtex.batch import find_scores, compile_scores, summary, main
+
+XML = Path(__file__).parent.parent / 'xml'
+
+
+class TestBatch(unittest.TestCase):
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'scores' / 'broken').mkdir(parents=True)
+            for name in ['test.xml', 'nocturne-chopin.xml']:
+                (directory / 'scores' / name).write_bytes((XML / name).read_bytes())
+            (directory / 'scores' / 'broken' / 'unknown.xml').write_text('<score><unknown/></score>')
+
+            jobs = find_scores([directory / 'scores'], directory / 'midi')
+            assert [target.relative_to(directory / 'midi').as_posix() for _, target in jobs] == \
+                   ['broken/unknown.mid', 'nocturne-chopin.mid', 'test.mid']
+
+            for workers in [1, 2]:
+                results = sorted(compile_scores(jobs, workers))
+                assert [result.error is None for result in results] == [False, True, True]
+                assert 'NotImplementedError' in results[0].error
+                assert all(result.target.exists() for result in results[1:])
+                assert all(set(result.timings) == {'parse', 'decode', 'contract', 'write'} for result in results[1:])
+                assert summary(results, 1.).startswith('2 compiled, 1 failed')
+
+            assert main([str(directory / 'scores' / 'test.xml'), '-o', str(directory / 'out'), '-j', '1']) == 0
+            assert (directory / 'out' / 'test.mid').exists()
+
+    def test_targets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            for name in ['a', 'b']:
+                (directory / name).mkdir()
+                (directory / name / 'test.xml').write_bytes((XML / 'test.xml').read_bytes())
+
+            # Files with the same name are written apart
+            jobs = find_scores([directory / 'a' / 'test.xml', directory / 'b' / 'test.xml'], directory / 'midi')
+            assert [target.relative_to(directory / 'midi').as_posix() for _, target in jobs] == \
+                   ['a/test.mid', 'b/test.mid']
+
+            with self.assertRaises(SystemExit):
+                main([str(directory / 'a'), str(directory / 'b'), '-o', str(directory / 'midi')])
+            with self.assertRaises(SystemExit):
+                main([str(directory / 'a' / 'test.xml'), '-j', '0'])
+            assert not (directory / 'midi').exists()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from harmtex import frac, Pitch, Hit, Chord, Rhythm, Harmony, Texture, Instrument, Section, Instrumentation, \
+    TensorContraction
+from harmtex.cache import NoteCache, fingerprint, note_cache
+from factories import block
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        note_cache.clear()
+
+    def test_shapes(self):
+        r = Rhythm(Hit('1/4', '1/8'), Hit('1/2', '1/4'))
+        assert r.shape == ((8, frozenset({(0, 1), (2, 2)})), 2)
+        assert (r + frac(1, 3)).shape == (r.shape[0], 14)
+        assert Rhythm._from_ticks({(6, 3), (12, 6)}, 24).shape[0] == r.shape[0]
+        assert (Chord({60, 64}) + 3).shape == (frozenset({0, 4}), 63)
+
+    def test_fingerprint(self):
+        key, start, low = block().fingerprint
+        assert (start, low) == (0, 60)
+        assert (block() + frac(1, 5) + 3).fingerprint == (key, frac(1, 5), 63)
+        assert (Pitch(-2) + block()).fingerprint[0] == key
+        assert fingerprint(block().voices()) == block().fingerprint
+
+        # Shifts and transpositions of fresh copies give the same key
+        moved = TensorContraction(block().harmony + 5, block().texture + frac(7, 3), block().instrumentation)
+        assert moved.fingerprint == (key, frac(7, 3), 65)
+        assert (block() - block()).fingerprint[0] != key
+
+    def test_reuse(self):
+        notes = block().to_note_array()
+        assert note_cache.stats()['misses'] == 1
+
+        moved = block() + frac(1, 5) + 3
+        assert moved.notes() == {n for n in moved.to_note_array().to_notes()}
+        assert moved.notes() == {type(n)(n.pitch + 3, n.onset + frac(1, 5), n.duration, n.instrument)
+                                 for n in notes.to_notes()}
+        assert note_cache.stats()['hits'] == 3 and note_cache.stats()['misses'] == 1
+
+    def test_factors_copied(self):
+        h = Harmony(Chord({60, 64}), Chord({67}))
+        t = Texture(Rhythm(Hit('0', '1/8')), Rhythm(Hit('1/8', '1/8')))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn')))
+        tc = TensorContraction(h, t, i)
+        notes = tc.notes()
+
+        # Later changes of the factors given change neither the fingerprint nor the notes, with a warm or cold cache
+        key = tc.fingerprint
+        h.chords[0] = Chord({50, 64, 72})
+        h.chords.append(Chord({48}))
+        t.rhythms[1] = Rhythm(Hit('1/2', '1/8'))
+        i.sections.reverse()
+        assert tc.fingerprint == key and tc.notes() == notes
+        note_cache.clear()
+        assert tc.notes() == notes and {n.pitch.number for n in tc.to_note_array().to_notes()} == {60, 64, 67}
+
+    def test_sizes(self):
+        tc = block() - block()
+        assert tc.estimate_note_count() == len(tc.notes()) == 10
+        assert (tc + 5).pitch_range() == (65, 72) and tc.extent == (0, frac(7, 6))
+        assert tc.instruments == {Instrument('Tuba'), Instrument('Horn')}
+        assert (block().harmony * block().texture).estimate_note_count() == 5
+
+        # Duplicated voices are counted twice
+        assert (block() | block()).estimate_note_count() == 2 * len((block() | block()).notes())
+
+    def test_budget(self):
+        note_cache.max_notes = 5
+        try:
+            with self.assertRaises(ValueError):
+                (block() - block()).to_note_array()
+            assert note_cache.stats()['entries'] == 0
+
+            stretched = TensorContraction(block().harmony, block().texture * 1000, block().instrumentation)
+            assert stretched.estimate_note_count() == len(stretched.to_note_array()) == 5
+
+            # Lazy repetitions and joins are refused before their notes are tiled or merged
+            lazy = block().lazy()
+            assert (lazy * 800).estimate_note_count() == 4000
+            assert len((lazy * 1).to_note_array()) == 5
+            for expression in [lazy * 800, lazy - lazy, lazy | (lazy + 1), (lazy + frac(1, 2)) * 2]:
+                with self.assertRaises(ValueError):
+                    expression.to_note_array()
+            with self.assertRaises(ValueError):
+                (block() - block()).iter_notes()
+
+            from harmtex.array import Template
+            template = Template(block().texture, block().instrumentation)
+            assert len(template.contract(block().harmony)) == 5
+            with self.assertRaises(ValueError):
+                template.contract_batch([Harmony(Chord({60}), Chord({67}))] * 3)
+        finally:
+            note_cache.max_notes = None
+
+    def test_eviction(self):
+        cache = NoteCache(max_bytes=0)
+        for tc in [block(), block() - block(), block() | (block() + 1)]:
+            cache.materialize(tc.fingerprint, tc.to_note_array)
+        assert len(cache) == 0
+
+        # Room for the block and its triple concatenation
+        size = block().to_note_array().data.nbytes
+        cache.resize(4 * size)
+        for tc in [block(), block() - block(), block(), block() - block() - block()]:
+            cache.materialize(tc.fingerprint, tc.to_note_array)
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 6 and stats['evictions'] == 1
+        assert stats['bytes'] == 4 * size
+
+        # The least recently used entry is evicted first
+        assert block().fingerprint[0] in cache.entries
+        assert (block() - block()).fingerprint[0] not in cache.entries
+
+
+if __name__ == '__main__':
+    unittest.main()
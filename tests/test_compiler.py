@@ -0,0 +1,176 @@
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import harmtex
+from harmtex.compiler import ScoreTree, AST
+from harmtex.scorecache import ScoreCache
+from harmtex.xmlbackend import get_backend
+from factories import nested_score
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+XML = Path(__file__).parent.parent / 'xml'
+
+
+class TestCompiler(unittest.TestCase):
+    def test_streaming(self):
+        for name in ['test.xml', 'nocturne-chopin.xml', 'symphony-mozart.xml']:
+            tree = ScoreTree(XML / name)
+            streamed = ScoreTree(XML / name, streaming=True)
+            assert streamed.root is None and streamed.tree is None
+            assert (streamed.title, streamed.composer, streamed.anacrusis) == \
+                   (tree.title, tree.composer, tree.anacrusis)
+            assert streamed.resolution == tree.resolution and streamed.objects.keys() == tree.objects.keys()
+            assert streamed.ast.notes() == tree.ast.notes()
+
+    def test_deep_nesting(self):
+        notes = ScoreTree(XML / 'nocturne-chopin.xml').ast.notes()
+        with tempfile.TemporaryDirectory() as directory:
+            # Deeper than the recursion limit, and than the limit of libxml2
+            path = Path(directory) / 'nested.xml'
+            path.write_text(nested_score(3000))
+            for backend in ['etree', 'lxml'] if lxml else ['etree']:
+                for streaming in [False, True]:
+                    assert ScoreTree(path, streaming=streaming, backend=backend).ast.notes() == notes
+                    tree = ScoreTree(XML / 'nocturne-chopin.xml', streaming=streaming, backend=backend)
+                    tree.update(path)
+                    assert tree.ast.notes() == notes
+
+    def test_unknown_tag(self):
+        tree = ScoreTree(XML / 'test.xml')
+        with self.assertRaises(NotImplementedError):
+            tree.decode(ET.fromstring('<chord><pitch><note>60</note></pitch></chord>'))
+
+    def test_update(self):
+        source = (XML / 'nocturne-chopin.xml').read_text()
+        edits = [
+            # A chord nested in the ast
+            ('<number>55</number>', '<number>56</number>',
+             {'chord-1-1-2', 'Accompaniment 1-1', 'Accompaniment 1-3', 'Accompaniment 1-4', 'Accompaniment 1', AST}),
+            # A rhythm of a texture the ast uses, and a texture it does not use
+            ('<rhythm id="texture-melody-2">',
+             '<rhythm id="texture-melody-2"><hit><onset num="1" den="8"/><duration num="1" den="8"/></hit>',
+             {'texture-melody-2', 'texture-melody', 'Meldoy-1-1', 'Meldoy-1', AST}),
+            ('<duration num="3" den="8"/>', '<duration num="2" den="8"/>', {'texture-bass'}),
+            ('<title>', '<title>New ', set()),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'edited.xml'
+            for streaming in [False, True]:
+                for old, new, decoded in edits:
+                    tree = ScoreTree(XML / 'nocturne-chopin.xml', streaming=streaming)
+                    # A compiled tree is scanned by its first update, the streaming first pass scans the file
+                    assert all((unit.source is None) != streaming for unit in tree.units)
+                    assert tree.update(XML / 'nocturne-chopin.xml') == set()
+                    objects = dict(tree.objects)
+                    parsed = []
+                    parse_unit = tree._parse_unit
+                    tree._parse_unit = lambda data, unit, declaration: \
+                        parsed.append(unit.key) or parse_unit(data, unit, declaration)
+                    path.write_text(source.replace(old, new, 1))
+                    assert tree.update(path) == decoded
+
+                    # Only the edited unit is parsed again, and the definitions left are not decoded again
+                    if not streaming:
+                        assert len(parsed) == 1
+                    assert all(tree.objects[name] is objects[name] for name in objects.keys() - decoded)
+                    compiled = ScoreTree(path)
+                    assert [unit.key for unit in tree.units] == [unit.key for unit in compiled.units]
+                    assert tree.title == compiled.title and tree.objects.keys() == compiled.objects.keys()
+                    assert tree.dependencies == compiled.dependencies and tree.digests == compiled.digests
+                    assert tree.ast.notes() == compiled.ast.notes()
+
+            # Removed metadata take their default value
+            for pattern in [r'<title>.*?</title>', r'<tempo>.*?</tempo>', r'<anacrusis .*?/>']:
+                path.write_text(re.sub(pattern, '', source, count=1, flags=re.S))
+                tree = ScoreTree(XML / 'nocturne-chopin.xml')
+                assert tree.update(path) == set()
+                compiled = ScoreTree(path)
+                assert (tree.title, tree.tempo.beat, tree.tempo.bpm, tree.anacrusis) == \
+                       (compiled.title, compiled.tempo.beat, compiled.tempo.bpm, compiled.anacrusis)
+
+            # A file that cannot be read raises the error of the backend, as a compilation does
+            for text in [source[:len(source) // 2], source.replace('</title>', '</composer>', 1)]:
+                path.write_text(text)
+                with self.assertRaises(Exception) as compiled:
+                    ScoreTree(path)
+                with self.assertRaises(type(compiled.exception)):
+                    ScoreTree(path, streaming=True)
+                for streaming in [False, True]:
+                    with self.assertRaises(type(compiled.exception)):
+                        ScoreTree(XML / 'nocturne-chopin.xml', streaming=streaming).update(path)
+
+            # A new timebase recompiles everything
+            path.write_text(source.replace('<onset num="0" den="8"/>', '<onset num="0" den="16"/>', 1))
+            tree = ScoreTree(XML / 'nocturne-chopin.xml')
+            assert tree.update(path) == set(tree.digests) and tree.resolution == ScoreTree(path).resolution
+
+    def test_backends(self):
+        assert get_backend('etree') is get_backend('etree') and get_backend().name == 'etree'
+        with mock.patch.dict(os.environ, {'HARMTEX_XML_BACKEND': 'lxml'}):
+            if lxml:
+                assert get_backend().name == 'lxml'
+            else:
+                with self.assertRaises(ImportError):
+                    get_backend()
+        with self.assertRaises(ValueError):
+            get_backend('expat')
+        with self.assertRaises(NotImplementedError):
+            ScoreTree(XML / 'test.xml', backend='etree', validate=True)
+
+    @unittest.skipIf(lxml is None, "lxml is not installed")
+    def test_backend_parity(self):
+        for name in ['test.xml', 'nocturne-chopin.xml', 'symphony-mozart.xml']:
+            for streaming in [False, True]:
+                tree = ScoreTree(XML / name, streaming=streaming, backend='etree')
+                accelerated = ScoreTree(XML / name, streaming=streaming, backend='lxml')
+                assert (accelerated.title, accelerated.composer, accelerated.anacrusis, accelerated.resolution) == \
+                       (tree.title, tree.composer, tree.anacrusis, tree.resolution)
+                assert (accelerated.tempo.beat, accelerated.tempo.bpm) == (tree.tempo.beat, tree.tempo.bpm)
+                assert accelerated.objects.keys() == tree.objects.keys()
+                assert accelerated.dependencies == tree.dependencies and accelerated.digests == tree.digests
+                assert accelerated.ast.notes() == tree.ast.notes()
+
+    def test_score_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ScoreCache(directory)
+            tree = ScoreTree(XML / 'test.xml', cache=cache)
+            cached = ScoreTree(XML / 'test.xml', cache=cache)
+            assert (tree.cache_status, cached.cache_status) == ('miss', 'hit')
+            assert cached.root is None and cached.objects.keys() == tree.objects.keys()
+            assert (cached.title, cached.tempo.bpm, cached.anacrusis) == (tree.title, tree.tempo.bpm, tree.anacrusis)
+            assert cached.ast.notes() == tree.ast.notes()
+
+            # Entries are keyed by the version too
+            key = cache.key((XML / 'test.xml').read_bytes())
+            version, harmtex.__version__ = harmtex.__version__, harmtex.__version__ + '.dev'
+            try:
+                assert cache.key((XML / 'test.xml').read_bytes()) != key
+            finally:
+                harmtex.__version__ = version
+
+            # A score cached without validation is not served to a validating compilation
+            assert cache.key((XML / 'test.xml').read_bytes(), validate=True) != key
+            with self.assertRaises(NotImplementedError):
+                ScoreTree(XML / 'test.xml', cache=cache, backend='etree', validate=True)
+
+            # Unreadable entries are compiled again
+            cache.path(key).write_bytes(b'not a score')
+            assert ScoreTree(XML / 'test.xml', cache=cache).cache_status == 'miss'
+
+            # The least recently used entries are evicted
+            ScoreTree(XML / 'nocturne-chopin.xml', cache=cache)
+            cache.resize(max(stat.st_size for stat, _ in cache.entries()))
+            assert cache.stats()['entries'] == 1 and cache.evictions == 1
+            assert ScoreTree(XML / 'test.xml', cache=cache).cache_status == 'miss'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import pickle
+import unittest
+from harmtex import frac, Hit, Chord, Rhythm, Harmony, Texture
+from harmtex.frozen import FrozenRhythm, FrozenChord, FrozenTexture, FrozenHarmony
+
+
+class TestFrozen(unittest.TestCase):
+    def test_hash_consing(self):
+        r_1 = Rhythm(Hit('1/4', '1/4'), Hit('1/2', '1/4')).freeze()
+        r_2 = (Rhythm(Hit('0', '1/4'), Hit('1/4', '1/4')) + frac(1, 4)).freeze()
+        assert isinstance(r_1, FrozenRhythm) and r_1 is r_2
+        assert r_1 == Rhythm(Hit('1/4', '1/4'), Hit('1/2', '1/4'))
+        assert r_1 != Rhythm(Hit('1/4', '1/4')).freeze()
+        assert len({r_1, r_2}) == 1
+
+        # Equal rhythms on different grids
+        assert Rhythm._from_ticks({(12, 6)}, 48).freeze() is Rhythm(Hit('1/4', '1/8')).freeze()
+
+        c = Chord({60, 64}).freeze()
+        assert isinstance(c, FrozenChord) and c is (Chord({59, 63}) + 1).freeze()
+
+        t = Texture(r_1, Rhythm(Hit('1/4', '1/4'), Hit('1/2', '1/4'))).freeze()
+        assert isinstance(t, FrozenTexture) and t.rhythms[0] is t.rhythms[1]
+        assert t == Texture(r_1, r_1) and t.freeze() is t
+
+        h = Harmony(Chord({60, 64}), Chord({67})).freeze()
+        assert isinstance(h, FrozenHarmony) and h.chords[0] is c
+        assert h + 1 == Harmony(Chord({61, 65}), Chord({68}))
+
+    def test_immutable(self):
+        r = Rhythm(Hit('1/4', '1/4')).freeze()
+        with self.assertRaises(AttributeError):
+            r.hits = set()
+        with self.assertRaises(AttributeError):
+            r.hits.add(Hit('1/2', '1/4'))
+        with self.assertRaises(TypeError):
+            Harmony(Chord({60})).freeze().chords[0] = Chord({62})
+
+    def test_operators(self):
+        t = Texture(Rhythm(Hit('0', '1/4')), Rhythm(Hit('1/4', '1/4'))).freeze()
+        h = Harmony(Chord({60}), Chord({64})).freeze()
+        assert (t - t)[:] == Texture(Rhythm(Hit('0', '1/4')), Rhythm(Hit('1/4', '1/4')),
+                                     Rhythm(Hit('1/2', '1/4')), Rhythm(Hit('3/4', '1/4')))
+        assert len((h * t).notes()) == 2
+
+    def test_pickle(self):
+        t = Texture(Rhythm(Hit('1/3', '1/4')), Rhythm(Hit('1/4', '1/4'))).freeze()
+        h = Harmony(Chord({60, 64}), Chord({67})).freeze()
+        assert pickle.loads(pickle.dumps(t)) is t
+        assert pickle.loads(pickle.dumps(h)) is h
+
+
+if __name__ == '__main__':
+    unittest.main()
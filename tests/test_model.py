@@ -1,7 +1,11 @@
 import unittest
+from multimethod import DispatchError, multimethod
 from harmtex import frac, Pitch, Hit, Chord, Rhythm, Harmony, Texture, Instrument, Section, Instrumentation, \
     TensorContraction
-from harmtex.model import HarmonicTexture
+from harmtex.model import HarmonicTexture, Note
+from harmtex.functions import concatenation, parallelization
+from harmtex.midi import to_midi
+from harmtex.utils import cache_dispatch
 
 
 class TestModel(unittest.TestCase):
@@ -17,6 +21,25 @@ class TestModel(unittest.TestCase):
         Chord({Pitch(60), Pitch(64), Pitch(67)})
         Chord({60, 64, 67})
 
+    def test_chord_bitmask(self):
+        c = Chord({60, 64, 67})
+        assert c._mask == (1 << 60) | (1 << 64) | (1 << 67) and len(c) == 3
+        assert c.numbers == (60, 64, 67) and c[[0, 2]] == Chord({60, 67})
+        assert c | Chord({62}) == Chord({60, 62, 64, 67}) and c & Chord({64, 67, 71}) == Chord({64, 67})
+        assert hash(c + 2) == hash(Chord({62, 66, 69})) and c + 2 == Chord({62, 66, 69})
+
+        # Pitches outside of the MIDI range are kept apart, and can come back into it
+        low = c + (-64)
+        assert low.numbers == (-4, 0, 3) and low._escape == frozenset({-4})
+        assert low + 64 == c and (c + 61).numbers == (121, 125, 128)
+        assert (low | c).pitches == {Pitch(n) for n in (-4, 0, 3, 60, 64, 67)}
+
+        # The pitches are read from the bitmask, so they are changed by setting them, not in place
+        with self.assertRaises(AttributeError):
+            c.pitches.add(Pitch(72))
+        c.pitches = c.pitches | {Pitch(72)}
+        assert c.numbers == (60, 64, 67, 72) and c == Chord({60, 64, 67, 72})
+
     def test_rhythm(self):
         r_1 = Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))})
         r_2 = Rhythm(Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4)))
@@ -31,12 +54,109 @@ class TestModel(unittest.TestCase):
         h_4 = Harmony({60, 64, 67}, {62, 65, 69})
         assert h_1 == h_2 == h_3 == h_4
 
+    def test_roman_numerals(self):
+        h = Harmony.from_roman_numerals(['I', 'V7', 'IV', 'I'], inversions=[0, 1, 2, 0], octaves=[4, 4, 4, 5],
+                                        n_notes=[None, None, 4, 2])
+        assert h == Harmony(Chord.from_roman_numeral('I', 0, 4), Chord.from_roman_numeral('V7', 1, 4),
+                            Chord.from_roman_numeral('IV', 2, 4, 4), Chord.from_roman_numeral('I', 0, 5, 2))
+        assert h[0] == Harmony(Chord({48, 52, 55}))
+
+        factors = [['1', '3', '5'], ['1', '-', '5', '3']]
+        h = Harmony.from_roman_numeral_factors(['i', 'V'], factors, octaves=[3, 4])
+        assert h == Harmony.from_roman_numeral('i', factors[0], 3) + Harmony.from_roman_numeral('V', factors[1], 4)
+        with self.assertRaises(ValueError):
+            Harmony.from_roman_numerals(['I', 'X'])
+
+    def test_rhythm_ticks(self):
+        r = Rhythm(Hit('1/4', '1/8'), Hit('1/2', '1/4'))
+        assert r.resolution == 8 and r.ticks() == {(2, 1), (4, 2)}
+        assert r.ticks(16) == {(4, 2), (8, 4)}
+
+        # A shift off the grid makes it finer instead of losing precision
+        shifted = r + frac(1, 3)
+        assert shifted.resolution == 24
+        assert shifted.hits == {Hit(frac(7, 12), frac(1, 8)), Hit(frac(5, 6), frac(1, 4))}
+        assert shifted + frac(-1, 3) == r
+        assert r * frac(2, 3) == Rhythm(Hit('1/6', '1/12'), Hit('1/3', '1/6'))
+        assert (r * frac(2, 3)).extent == (frac(1, 6), frac(1, 2))
+
+        # Setting the hits drops what was computed from the previous ones
+        r = r + frac(1, 3)
+        assert r.extent == (frac(7, 12), frac(13, 12))
+        r.hits = {Hit('1/2', '1/2')}
+        assert r.resolution == 2 and r.ticks() == {(1, 1)}
+        assert r.extent == (frac(1, 2), frac(1)) and r.shape == ((2, frozenset({(0, 1)})), 1)
+
+        # The hits change only through the setter
+        r = Rhythm(Hit('0', '1/4'))
+        with self.assertRaises(AttributeError):
+            r.hits.add(Hit('1/4', '1/4'))
+        r.hits = r.hits | {Hit('1/4', '1/4')}
+        assert Texture(r).endpoint == frac(1, 2)
+
     def test_texture(self):
         Texture([Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))}),
                  Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))})])
         Texture(Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))}),
                 Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))}))
 
+    def test_texture_extent(self):
+        t = Texture(Rhythm(Hit('-1/8', '1/8'), Hit('1/2', '1/4')),
+                    Rhythm(Hit('1/8', '1/8')))
+        assert t.extent == (frac(-1, 8), frac(3, 4))
+        assert t.endpoint == frac(3, 4)
+        assert Texture().extent is None and Texture().endpoint == 0
+
+        def fresh(texture):
+            return Texture([Rhythm(set(r.hits)) for r in texture.rhythms])
+
+        for result in [t + frac(1, 3), t * frac(3, 2), t + t, t - t, (t - t)[1:3], (t - (t + 5))[:]]:
+            assert result.extent == fresh(result).extent
+            assert result.endpoint == fresh(result).endpoint
+
+        # Hits ending before 0 do not move the endpoint of a concatenation
+        t_anacrusis = Texture(Rhythm(Hit('-1/4', '1/8')))
+        assert t_anacrusis.endpoint == 0
+        assert (t_anacrusis - t).extent == (frac(-1, 4), frac(3, 4))
+
+    def test_fast_constructors(self):
+        hits = {Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))}
+        assert Rhythm._make(hits) == Rhythm(hits)
+        assert Chord._make({Pitch._make(60), Pitch._make(64)}) == Chord({60, 64})
+        assert Harmony._make([Chord._make(set())]) == Harmony(Chord())
+        assert Section._make({Instrument('Horn')}) == Section(Instrument('Horn'))
+
+        # Cached dispatch still tells the overloads apart by the items of the containers
+        for _ in range(2):
+            assert Harmony([{60}, {64}]) == Harmony([Chord({60}), Chord({64})])
+            assert Rhythm({(frac(1, 4), frac(1, 4)), (frac(1, 2), frac(1, 4))}) == Rhythm(hits)
+            assert Pitch(60) + 2 == Pitch(62) and Pitch(60) + Pitch(2) == Pitch(62)
+
+        # Calls with keywords are dispatched by multimethod
+        @cache_dispatch
+        class Scaled:
+            @multimethod
+            def scale(self, value: int, factor: int = 1):
+                return value * factor
+
+            @multimethod
+            def scale(self, value: str, factor: int = 1):
+                return value * factor
+
+        assert (Scaled().scale(2, factor=3), Scaled().scale('a', factor=3), Scaled().scale(2)) == (6, 'aaa', 2)
+        with self.assertRaises(DispatchError):
+            Hit(onset=frac(1, 4), duration=frac(1, 4))
+
+        # Operators do not go through the constructors, which cannot tell empty sets apart
+        assert Harmony(Chord({60})).extend(2) + 1 == Harmony(Chord({61}), Chord(), Chord())
+
+    def test_interning(self):
+        import pickle
+        assert Pitch(60) is Pitch(60) is Pitch(Pitch(60)) is Pitch(59) + 1
+        assert Instrument('Horn') is Instrument('Horn')
+        assert pickle.loads(pickle.dumps(Pitch(60))) is Pitch(60)
+        assert pickle.loads(pickle.dumps(Instrument('Horn'))) is Instrument('Horn')
+
     def test_harmonic_texture(self):
         harmony = Harmony([Chord({Pitch(60), Pitch(64), Pitch(67)}), Chord({Pitch(62), Pitch(65), Pitch(69)})])
         texture = Texture(Rhythm({Hit(frac(1, 4), frac(1, 4)), Hit(frac(1, 2), frac(1, 4))}),
@@ -59,6 +179,188 @@ class TestModel(unittest.TestCase):
         tc = TensorContraction(h, t, i)
         assert len(tc.notes()) == 9
 
+    def test_pending_offsets(self):
+        t = Texture(Rhythm(Hit('0', '1/8')), Rhythm(Hit('1/8', '1/8'), Hit('1/4', '1/3')))
+        h = Harmony(Chord({60}), Chord({64, 67}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn')))
+        tc = TensorContraction(h, t, i)
+
+        # Nested shifts and transpositions share the factors of the original
+        moved = Pitch(12) + (tc + frac(1, 2)) + frac(1, 4) + (-5)
+        assert moved._texture is tc._texture and moved._harmony is tc._harmony
+        assert (moved.shift, moved.transposition) == (frac(3, 4), 7)
+        assert moved.extent == (frac(3, 4), frac(4, 3))
+
+        expected = {Note(n.pitch + 7, n.onset + frac(3, 4), n.duration, n.instrument) for n in tc.notes()}
+        assert moved.notes() == expected
+        assert set(moved.iter_notes()) == expected
+        assert moved.texture == t + frac(3, 4) and moved.harmony == h + 7
+        assert moved == TensorContraction(h + 7, t + frac(3, 4), i)
+
+        # Setting a factor drops the fingerprint of the cached notes
+        tc.notes()
+        tc.harmony = Harmony(Chord({72}), Chord({76}))
+        assert {n.pitch.number for n in tc.notes()} == {72, 76}
+        tc.texture = t + 1
+        assert min(n.onset for n in tc.notes()) == 1
+        tc.instrumentation = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Tuba')))
+        assert {n.instrument.name for n in tc.notes()} == {'Tuba'}
+        assert tc.notes() == TensorContraction(Harmony(Chord({72}), Chord({76})), t + 1, tc.instrumentation).notes()
+
+    def test_iter_notes(self):
+        t = Texture(Rhythm(Hit('1/8', '1/8'), Hit('1/8', '1/4'), Hit('1/3', '1/3')),
+                    Rhythm(Hit('0', '1/8'), Hit('1/8', '1/8')),
+                    Rhythm(Hit('1/8', '1/8')))
+        h = Harmony(Chord({60, 64}), Chord({67}), Chord({60}))
+        i = Instrumentation(Section(Instrument('Tuba'), Instrument('French Horn')), Section(Instrument('French Horn')),
+                            Section(Instrument('Tuba')))
+        tc = TensorContraction(h, t, i) - TensorContraction(h, t, i) + frac(-1, 2)
+
+        notes = list(tc.iter_notes())
+        assert set(notes) == tc.notes() and len(notes) == len(tc.notes())
+        keys = [(n.onset, n.pitch.number, n.duration, n.instrument.name) for n in notes]
+        assert keys == sorted(keys)
+        assert tc.ordered_notes() == notes
+
+        # The MIDI file is the same whether the notes are streamed or not
+        def midi_notes(midi):
+            return sorted((track.program, n.pitch, n.start, n.end) for track in midi.instruments for n in track.notes)
+
+        assert midi_notes(tc.to_midi()) == midi_notes(to_midi(tc.iter_notes()))
+
+    def test_time_window(self):
+        t = Texture(Rhythm(Hit('0', '2'), Hit('5/2', '1/8')),
+                    Rhythm(*[Hit(frac(k, 4), frac(1, 4)) for k in range(16)]),
+                    Rhythm(Hit('1/3', '1/3')))
+        h = Harmony(Chord({36}), Chord({60, 64}), Chord({72}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn')), Section(Instrument('Horn')))
+        tc = TensorContraction(h, t, i)
+
+        for start, end in [(frac(0), frac(4)), (frac(1, 2), frac(3, 4)), (frac(2), frac(5, 2)),
+                           (frac(5, 12), frac(17, 24)), (frac(5), frac(6)), (frac(-1), frac(0))]:
+            expected = {n for n in tc.notes() if n.onset < end and n.end > start}
+            assert tc.notes_between(start, end) == expected
+
+            cropped = tc.crop(start, end)
+            assert cropped.notes() == {Note(n.pitch, max(n.onset, start), min(n.end, end) - max(n.onset, start),
+                                            n.instrument) for n in expected}
+
+        assert len(tc.crop(frac(5), frac(6)).texture) == 0
+        assert len(tc.crop(frac(5, 2), frac(11, 4)).texture) == 2
+
+        # Hits of very different lengths, against a scan of every hit
+        from random import Random
+        from harmtex.array import IntervalIndex
+        random = Random(0)
+        rhythms = [Rhythm(*[Hit(frac(random.randrange(-64, 512), 8), frac(random.choice([0, 1, 3, 16, 700]), 8))
+                            for _ in range(40)]) for _ in range(5)]
+        index = IntervalIndex(rhythms)
+        for _ in range(50):
+            start = frac(random.randrange(-80, 600), 8)
+            end = start + frac(random.randrange(0, 40), 8)
+            positions = index.query(start, end)
+            assert positions.tolist() == sorted(positions.tolist())
+            found = {(v, o, d) for v, o, d in zip(index.voice[positions].tolist(), index.onset[positions].tolist(),
+                                                  index.duration[positions].tolist())}
+            assert found == {(v, o, d) for v, r in enumerate(rhythms) for o, d in r.ticks(index.resolution)
+                             if o < end * index.resolution and o + d > start * index.resolution}
+
+        # The index follows a new texture
+        tc.texture = t + 10
+        assert tc.notes_between(frac(0), frac(4)) == set()
+        assert len(tc.notes_between(frac(10), frac(14))) == len(tc.notes())
+
+    def test_note_array(self):
+        t = Texture(Rhythm(Hit('0/8', '1/8'), Hit('1/3', '1/3')),
+                    Rhythm(Hit('1/8', '1/8'), Hit('2/8', '1/8')))
+        h = Harmony(Chord({60}), Chord({64, 67}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn'), Instrument('Trumpet')))
+        tc = TensorContraction(h, t, i)
+
+        notes = tc.to_note_array()
+        assert notes.resolution == 24
+        assert len(notes) == 10
+        assert notes.to_notes() == tc.notes()
+        assert set(notes.pitch.tolist()) == {60, 64, 67}
+        assert notes.start == 0 and notes.end == frac(2, 3)
+
+        ordered = notes.ordered()
+        assert ordered.onset.tolist() == sorted(ordered.onset.tolist())
+
+        # Duplicated voices collapse like in a set of notes
+        assert len((tc | tc).to_note_array()) == 10
+
+    def test_concatenation(self):
+        t = Texture(Rhythm(Hit('-1/8', '1/8'), Hit('0', '1/4')),
+                    Rhythm(Hit('1/8', '1/8'), Hit('2/8', '3/8')))
+        h = Harmony(Chord({60}), Chord({64, 67}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn'), Instrument('Trumpet')))
+        blocks = [TensorContraction(h, t, i), TensorContraction(h, t, i) + frac(1, 3), TensorContraction(h, t, i) + 5]
+
+        assert concatenation(*blocks) == blocks[0] - blocks[1] - blocks[2]
+        assert parallelization(*blocks) == blocks[0] | blocks[1] | blocks[2]
+        assert concatenation(*blocks).texture.extent == (frac(-1, 8), frac(15, 8) + frac(1, 3))
+        assert concatenation(blocks[0]) is blocks[0]
+
+        lazy = concatenation(blocks[0].lazy(), blocks[1], blocks[2])
+        assert lazy.notes() == (blocks[0] - blocks[1] - blocks[2]).notes()
+
+    def test_repeat(self):
+        t = Texture(Rhythm(Hit('-1/8', '1/8'), Hit('0', '1/4')),
+                    Rhythm(Hit('1/8', '1/8')))
+        h = Harmony(Chord({60}), Chord({64, 67}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn')))
+        tc = TensorContraction(h, t, i)
+
+        assert tc * 1 is tc
+        assert tc * 3 == tc - (tc - tc)
+        assert (tc.lazy() * 3).notes() == (tc * 3).notes()
+
+        # Deeper than the recursion limit
+        repeated = tc * 5000
+        assert len(repeated.texture) == 10000
+        assert repeated.texture.endpoint == 5000 * t.endpoint
+        assert len((tc.lazy() * 5000).to_note_array()) == len(repeated.to_note_array()) == 20000
+
+    def test_lazy(self):
+        t = Texture(Rhythm(Hit('-1/8', '1/8'), Hit('0', '1/4')),
+                    Rhythm(Hit('1/8', '1/8'), Hit('2/8', '3/8')))
+        h = Harmony(Chord({60}), Chord({64, 67}))
+        i = Instrumentation(Section(Instrument('Tuba')), Section(Instrument('Horn'), Instrument('Trumpet')))
+        tc = TensorContraction(h, t, i)
+        block = tc.lazy()
+
+        eager = ((tc - (tc + frac(1, 3))) | (Pitch(12) + tc)) - (tc + 7) * 3
+        lazy = ((block - (block + frac(1, 3))) | (Pitch(12) + block)) - (block + 7) * 3
+        assert lazy.notes() == eager.notes()
+        assert lazy.endpoint == eager.texture.endpoint
+        assert lazy.evaluate() == eager
+
+        # Every way of listing the notes agrees on their order
+        notes = eager.ordered_notes()
+        assert lazy.ordered_notes() == notes == list(eager.iter_notes())
+        ordered = eager.to_note_array().ordered()
+        assert [(n.onset, n.pitch.number, n.duration, n.instrument.name) for n in notes] == \
+            [(frac(o, ordered.resolution), p, frac(d, ordered.resolution), ordered.instruments[k].name)
+             for p, o, d, k in ordered.data.tolist()]
+
+        # Mixing eager and lazy operands promotes to a lazy expression
+        assert (tc - block).notes() == (tc - tc).notes()
+
+        # n-ary nodes join all their operands at once, as the binary operators do
+        blocks = [tc, tc + frac(1, 3), tc + 5]
+        assert concatenation(*(b.lazy() for b in blocks)).evaluate() == blocks[0] - blocks[1] - blocks[2]
+        assert parallelization(*(b.lazy() for b in blocks)).evaluate() == blocks[0] | blocks[1] | blocks[2]
+
+        # Chains of binary operators are joined once, shared links apart
+        chain, nested = block, block
+        for k in range(1, 50):
+            chain, nested = chain - (block + k), (block + k) | nested
+        assert chain.evaluate() == concatenation(tc, *(tc + k for k in range(1, 50)))
+        assert nested.evaluate() == parallelization(*(tc + k for k in reversed(range(50))))
+        shared = block - (block + 1)
+        assert (shared - shared - block).evaluate() == (tc - (tc + 1)) - (tc - (tc + 1)) - tc
+
 
 if __name__ == '__main__':
     test_objects = TestModel()